@@ -1,37 +1,69 @@
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 
-from datetime import timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from urllib.parse import urlencode
+import asyncio
 
 from app.db import (
     get_status,
     get_all_users,
     add_user,
     delete_user,
-    SessionLocal,
+    update_user,
     get_user_by_id,
-    engine,
-    Base
+    get_users_by_tg_ids,
+    search_action_logs,
+    get_data_versions,
+    pinned_reads,
+    ensure_schema
 )
-from app.models import RoleEnum, User, ActionLog
-from app.config import ADMIN_API_KEY
+from app.models import RoleEnum
+from app.config import ADMIN_API_KEY, JINJA_CACHE_DIR
+from app.admin.render_cache import render_cache, make_etag, etag_matches
+from app.profiler import profiler
+from app.audit import audit
 
 
 # Часовой пояс Москва
 MSK = timezone(timedelta(hours=3))
 
+ACTION_LABELS = {
+    "set_on": "Включено",
+    "set_off": "Выключено",
+    "access_request": "Запрос доступа",
+    "login": "Вход в админку",
+    "user_add": "Добавлен пользователь",
+    "user_edit": "Изменён пользователь",
+    "user_delete": "Удалён пользователь",
+}
+
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    ensure_schema()
 
 
 app = FastAPI()
 create_tables()
 
+
+@app.on_event("startup")
+async def start_audit():
+    audit.start()
+
+
+@app.on_event("shutdown")
+async def stop_audit():
+    await audit.stop()
+
+
 app.mount("/static", StaticFiles(directory="app/admin/static"), name="static")
 templates = Jinja2Templates(directory="app/admin/templates")
+# скомпилированные шаблоны переживают перезапуск процесса
+templates.env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
 
 
 def require_admin(request: Request):
@@ -56,23 +88,48 @@ def login(request: Request, key: str = Form(...)):
             samesite="Lax",
             max_age=3600
         )
+        audit.log_threadsafe("admin", "login", f"ip={request.client.host if request.client else '-'}")
         return resp
 
     return templates.TemplateResponse("login.html", {"request": request, "error": "Неверный ключ"})
 
 
+def cached_page(request: Request, page: str, deps: tuple, params: tuple, render):
+    # одна проверка версий; если данные не менялись — 304 или HTML из кэша.
+    # Версии и данные страницы читаются из одной БД: иначе при отстающей
+    # реплике старый HTML попал бы в кэш под новым ETag
+    with pinned_reads():
+        versions = get_data_versions()
+        etag = make_etag(page, [versions.get(d, 0) for d in deps], params)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        key = (page, params)
+        body = render_cache.get(key, etag)
+        if body is None:
+            body = render()
+            render_cache.put(key, etag, body)
+
+    return HTMLResponse(body, headers=headers)
+
+
+def render_template(name: str, context: dict) -> str:
+    return templates.get_template(name).render(context)
+
+
 @app.get("/admin", response_class=HTMLResponse)
 def admin_index(request: Request):
     if not require_admin(request):
         return RedirectResponse("/login")
 
-    st = get_status()
-    status_value = st.status if st else "unknown"
+    def render():
+        st = get_status()
+        status_value = st.status if st else "unknown"
+        return render_template("index.html", {"request": request, "status": status_value})
 
-    return templates.TemplateResponse(
-        "index.html",
-        {"request": request, "status": status_value}
-    )
+    return cached_page(request, "index", ("status",), (), render)
 
 
 @app.get("/admin/users", response_class=HTMLResponse)
@@ -80,11 +137,11 @@ def admin_users(request: Request):
     if not require_admin(request):
         return RedirectResponse("/login")
 
-    users = get_all_users()
-    return templates.TemplateResponse(
-        "users.html",
-        {"request": request, "users": users}
-    )
+    def render():
+        users = get_all_users()
+        return render_template("users.html", {"request": request, "users": users})
+
+    return cached_page(request, "users", ("users",), (), render)
 
 
 @app.post("/admin/users/add")
@@ -119,6 +176,7 @@ def admin_add_user(
         name=name,
         role=role_enum
     )
+    audit.log_threadsafe("admin", "user_add", f"tg_id={tg_int}, role={role_enum.value}")
 
     return RedirectResponse("/admin/users", status_code=302)
 
@@ -129,6 +187,8 @@ def admin_delete_user(request: Request, user_id: int):
         return RedirectResponse("/login")
 
     delete_user(user_id)
+    # удалённого пользователя больше нигде не видно — пишем сразу
+    audit.log_threadsafe("admin", "user_delete", f"user_id={user_id}", durable=True)
     return RedirectResponse("/admin/users", status_code=302)
 
 
@@ -155,77 +215,192 @@ def edit_user_action(
     if not require_admin(request):
         return RedirectResponse("/login")
 
-    db = SessionLocal()
-    user = db.query(User).filter(User.id == user_id).first()
+    try:
+        role_enum = RoleEnum(role)
+    except ValueError:
+        role_enum = RoleEnum.guest
+
+    update_user(user_id, name=name, tg_id=tg_id, role=role_enum)
+
+    audit.log_threadsafe("admin", "user_edit", f"user_id={user_id}, role={role_enum.value}")
+    return RedirectResponse("/admin/users", status_code=302)
+
 
-    user.name = name
-    user.telegram_id = tg_id
+LOGS_PER_PAGE = 50
 
+
+def parse_date(value: str | None) -> date | None:
     try:
-        user.role = RoleEnum(role)
+        return date.fromisoformat(value) if value else None
     except ValueError:
-        user.role = RoleEnum.guest
+        return None
 
-    db.commit()
-    db.close()
 
-    return RedirectResponse("/admin/users", status_code=302)
+def make_cursor(log) -> str:
+    return f"{log.timestamp.isoformat()}_{log.id}"
+
+
+def parse_cursor(value: str | None) -> tuple[datetime, int] | None:
+    # "<timestamp>_<id>" последней/первой записи страницы
+    try:
+        ts, _, log_id = (value or "").rpartition("_")
+        return (datetime.fromisoformat(ts), int(log_id)) if ts else None
+    except ValueError:
+        return None
 
 
 @app.get("/admin/logs", response_class=HTMLResponse)
-def admin_logs(request: Request):
+def admin_logs(
+        request: Request,
+        actor: str = "",
+        action: str = "",
+        date_from: str = "",
+        date_to: str = "",
+        before: str = "",
+        after: str = ""
+):
     if not require_admin(request):
         return RedirectResponse("/login")
 
-    db = SessionLocal()
-    logs = db.query(ActionLog).order_by(ActionLog.id.desc()).all()
-
-    formatted_logs = []
-
-    for log in logs:
-        # ИЩЕМ ПОЛЬЗОВАТЕЛЯ ПО telegram_id
-        user = db.query(User).filter(User.telegram_id == str(log.actor)).first()
-
-        if user:
-            name = user.name
-            tg_id = user.telegram_id
-        else:
-            name = "Не найден"
-            tg_id = log.actor
-
-        # Преобразование действия
-        if log.action == "set_on":
-            action_label = "Включено"
-        elif log.action == "set_off":
-            action_label = "Выключено"
-        else:
-            action_label = log.action
-
-        # Преобразование деталей
-        if log.details and "old_status=" in log.details:
-            raw = log.details.split("=")[1]
-            status_human = "Включено" if raw == "on" else "Выключено"
-            details_label = f"Прошлый статус: {status_human}"
-        else:
-            details_label = log.details
-
-        # Дата МСК
-        timestamp = log.timestamp.astimezone(MSK).strftime("%d.%m.%Y %H:%M:%S")
-
-        formatted_logs.append({
-            "id": log.id,
-            "name": name,
-            "tg_id": tg_id,
-            "action": action_label,
-            "details": details_label,
-            "timestamp": timestamp
-        })
-
-    db.close()
+    actor = actor.strip()
+    before_key = parse_cursor(before)
+    after_key = None if before_key else parse_cursor(after)
+
+    # фильтры живут в query string — страницу можно сохранить в закладки
+    filters = {
+        k: v for k, v in {
+            "actor": actor,
+            "action": action,
+            "date_from": date_from,
+            "date_to": date_to,
+        }.items() if v
+    }
+
+    def page_url(**cursor) -> str:
+        return "/admin/logs?" + urlencode({**filters, **cursor})
+
+    def render():
+        logs, has_older, has_newer = search_action_logs(
+            actor=actor or None,
+            action=action or None,
+            date_from=parse_date(date_from),
+            date_to=parse_date(date_to),
+            before=before_key,
+            after=after_key,
+            per_page=LOGS_PER_PAGE
+        )
+
+        # все пользователи страницы одним запросом
+        users = get_users_by_tg_ids(log.actor for log in logs)
+
+        formatted_logs = []
+
+        for log in logs:
+            user = users.get(str(log.actor))
+
+            if user:
+                name = user.name
+                tg_id = user.telegram_id
+            else:
+                name = "Не найден"
+                tg_id = log.actor
+
+            # Преобразование действия
+            action_label = ACTION_LABELS.get(log.action, log.action)
+
+            # Преобразование деталей
+            if log.details and "old_status=" in log.details:
+                raw = log.details.split("=")[1]
+                status_human = "Включено" if raw == "on" else "Выключено"
+                details_label = f"Прошлый статус: {status_human}"
+            else:
+                details_label = log.details
+
+            # Дата МСК
+            timestamp = log.timestamp.astimezone(MSK).strftime("%d.%m.%Y %H:%M:%S")
+
+            formatted_logs.append({
+                "id": log.id,
+                "name": name,
+                "tg_id": tg_id,
+                "action": action_label,
+                "details": details_label,
+                "timestamp": timestamp
+            })
+
+        return render_template(
+            "logs.html",
+            {
+                "request": request,
+                "logs": formatted_logs,
+                "filters": filters,
+                "actions": ACTION_LABELS,
+                "first_url": page_url() if before_key or after_key else None,
+                "prev_url": page_url(after=make_cursor(logs[0])) if logs and has_newer else None,
+                "next_url": page_url(before=make_cursor(logs[-1])) if logs and has_older else None,
+            }
+        )
+
+    # имена в логах берутся из users — зависим и от них
+    params = tuple(sorted(filters.items())) + (("before", before_key), ("after", after_key))
+    return cached_page(request, "logs", ("logs", "users"), params, render)
+
+
+# ---------------------------------------------------------
+# Профилировщик
+# ---------------------------------------------------------
+
+@app.get("/admin/profiler", response_class=HTMLResponse)
+def admin_profiler(request: Request):
+    if not require_admin(request):
+        return RedirectResponse("/login")
 
     return templates.TemplateResponse(
-        "logs.html",
-        {"request": request, "logs": formatted_logs}
+        "profiler.html",
+        {"request": request, "info": profiler.info()}
+    )
+
+
+@app.post("/admin/profiler/start")
+async def admin_profiler_start(request: Request, seconds: int = Form(30)):
+    if not require_admin(request):
+        return RedirectResponse("/login")
+
+    try:
+        profiler.start(seconds, loop=asyncio.get_running_loop())
+    except RuntimeError:
+        pass
+
+    return RedirectResponse("/admin/profiler", status_code=302)
+
+
+@app.post("/admin/profiler/stop")
+async def admin_profiler_stop(request: Request):
+    if not require_admin(request):
+        return RedirectResponse("/login")
+
+    await asyncio.to_thread(profiler.stop)
+    return RedirectResponse("/admin/profiler", status_code=302)
+
+
+@app.get("/admin/profiler/download/{fmt}")
+def admin_profiler_download(request: Request, fmt: str):
+    if not require_admin(request):
+        return RedirectResponse("/login")
+
+    if fmt == "collapsed":
+        content = profiler.collapsed().encode()
+        filename = "admin.collapsed.txt"
+    elif fmt == "pstats":
+        content = profiler.pstats_bytes()
+        filename = "admin.pstats"
+    else:
+        return Response(status_code=404)
+
+    return Response(
+        content,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
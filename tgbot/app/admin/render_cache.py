@@ -0,0 +1,58 @@
+# app/admin/render_cache.py
+# Кэш отрендеренных страниц админки, привязанный к версиям данных
+# (таблица data_version). Версия не изменилась — тот же ETag и тот же HTML.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import RENDER_CACHE_SIZE
+
+# меняется при каждом запуске: после деплоя шаблоны могли стать другими
+_BOOT = str(time.time_ns())
+
+
+def make_etag(page: str, versions: list, params: tuple) -> str:
+    raw = repr((_BOOT, page, versions, params)).encode()
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class RenderCache:
+    # LRU: при переполнении вытесняется самая давно запрошенная страница
+
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, etag: str) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] != etag:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, etag: str, body: str):
+        with self._lock:
+            self._items[key] = (etag, body)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+
+render_cache = RenderCache()
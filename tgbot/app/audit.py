@@ -0,0 +1,199 @@
+# app/audit.py
+# Журнал действий с отложенной записью: события складываются в очередь
+# и пишутся в action_log пачками (по размеру или по времени).
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import AUDIT_QUEUE_SIZE, AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL
+from app.db import write_action_logs, set_action_log_sink
+from app.models import now_moscow
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def make_entry(actor, action: str, details: str = "") -> dict:
+    return dict(
+        actor=str(actor),
+        action=action,
+        details=details,
+        timestamp=now_moscow()
+    )
+
+
+class AuditLog:
+
+    def __init__(
+            self,
+            maxsize: int = AUDIT_QUEUE_SIZE,
+            batch_size: int = AUDIT_BATCH_SIZE,
+            flush_interval: float = AUDIT_FLUSH_INTERVAL
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._worker: asyncio.Task | None = None
+        # при остановке новые записи пишутся сразу, а stop() дожидается
+        # тех, кто уже стоит в ожидании места в очереди (_putting)
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._putting = 0
+        # свой поток для записи: потоки общего пула могут все стоять
+        # в ожидании места в очереди (backpressure), и запись бы не началась
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audit-writer")
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        if self.running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._stopping = False
+        self._worker = asyncio.create_task(self._run())
+
+        # set_status больше не пишет лог в своей транзакции
+        set_action_log_sink(self._submit_entry)
+        logger.info("Audit queue started (size=%d, batch=%d)", self.maxsize, self.batch_size)
+
+    async def stop(self):
+        if not self.running:
+            return
+
+        set_action_log_sink(None)
+        with self._lock:
+            self._stopping = True
+        await self._queue.put(_STOP)
+        await self._worker
+
+        # то, что успели положить после _STOP, и записи producer'ов,
+        # которые ждали места в очереди: читаем, пока ждущих не останется
+        while True:
+            rest = []
+            while not self._queue.empty():
+                entry = self._queue.get_nowait()
+                if entry is not _STOP:
+                    rest.append(entry)
+            if rest:
+                await self._flush(rest)
+
+            with self._lock:
+                waiting = self._putting
+            if not waiting and self._queue.empty():
+                break
+            await asyncio.sleep(0.01)
+
+        self._worker = None
+        self._stopping = False
+        logger.info("Audit queue stopped")
+
+    # -----------------------------------------------------
+    # Запись событий
+    # -----------------------------------------------------
+
+    async def log(self, actor, action: str, details: str = "", durable: bool = False):
+        entry = make_entry(actor, action, details)
+
+        with self._lock:
+            queued = not durable and self.running and not self._stopping
+            if queued:
+                self._putting += 1
+
+        if not queued:
+            await asyncio.to_thread(write_action_logs, [entry])
+            return
+
+        try:
+            # при заполненной очереди ждём здесь — это и есть backpressure
+            await self._queue.put(entry)
+        finally:
+            with self._lock:
+                self._putting -= 1
+
+    def log_threadsafe(self, actor, action: str, details: str = "", durable: bool = False):
+        # для синхронного кода (обработчики админки, asyncio.to_thread)
+        entry = make_entry(actor, action, details)
+
+        if durable:
+            write_action_logs([entry])
+            return
+
+        self._submit_entry(entry)
+
+    def _submit_entry(self, entry: dict):
+        loop = self._loop
+        in_loop = threading.get_ident() == self._loop_thread
+
+        with self._lock:
+            queued = self.running and not self._stopping and loop is not None and not loop.is_closed()
+            if queued and not in_loop:
+                self._putting += 1
+
+        if not queued:
+            write_action_logs([entry])
+            return
+
+        if in_loop:
+            # в потоке event loop блокироваться нельзя
+            try:
+                self._queue.put_nowait(entry)
+            except asyncio.QueueFull:
+                write_action_logs([entry])
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self._queue.put(entry), loop).result()
+        finally:
+            with self._lock:
+                self._putting -= 1
+
+    # -----------------------------------------------------
+    # Групповая запись
+    # -----------------------------------------------------
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        try:
+            await asyncio.get_running_loop().run_in_executor(self._writer, write_action_logs, batch)
+        except Exception as e:
+            logger.exception("Failed to write %d audit entries: %s", len(batch), e)
+
+
+# одна очередь на процесс
+audit = AuditLog()
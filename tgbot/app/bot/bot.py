@@ -3,7 +3,6 @@ import logging
 from datetime import datetime, timezone
 
 from aiogram import Dispatcher, F
-from aiogram.filters import CommandStart, Command
 from aiogram.types import (
     Message,
     InlineKeyboardMarkup,
@@ -11,15 +10,18 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
     BotCommand,
-    CallbackQuery
+    CallbackQuery,
+    BufferedInputFile
 )
 
 from app.bot.bot_instance import bot
 from app.bot.scheduler import setup_scheduler, cancel_reminders
+from app.bot.status_cache import status_cache
+from app.bot.executor import update_executor, ChatOrderedMiddleware
+from app.bot.notifier import status_notifier
+from app.bot.text_router import TextRouter
 
 from app.db import (
-    get_status,
-    set_status,
     get_user_by_tg_id,
     get_all_receivers,
     add_user,
@@ -27,10 +29,17 @@ from app.db import (
 )
 
 from app.models import RoleEnum
+from app.audit import audit
+from app.profiler import profiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 dp = Dispatcher()
+dp.update.outer_middleware(ChatOrderedMiddleware(update_executor))
+
+# все текстовые кнопки и команды — один обработчик с поиском по словарю
+text_router = TextRouter()
+dp.message.register(text_router.dispatch)
 
 
 # ---------------------------------------------------------
@@ -119,6 +128,11 @@ async def guest_request_access(cb: CallbackQuery):
         except:
             pass
 
+    await audit.log(
+        cb.from_user.id,
+        "access_request",
+        f"name={cb.from_user.first_name}"
+    )
     await cb.answer("Запрос отправлен!", show_alert=True)
 
 
@@ -126,7 +140,7 @@ async def guest_request_access(cb: CallbackQuery):
 # АДМИНКА
 # ---------------------------------------------------------
 
-@dp.message(lambda m: m.text and m.text.strip() == "Админка")
+@text_router.text("Админка")
 async def admin_link(msg: Message):
     user = await asyncio.to_thread(get_user_by_tg_id, msg.from_user.id)
 
@@ -148,11 +162,122 @@ async def admin_link(msg: Message):
 
 
 
+# ---------------------------------------------------------
+# Профилировщик: /profile [секунд] | /profile stop
+# ---------------------------------------------------------
+
+_profile_task: asyncio.Task | None = None
+
+
+@text_router.command("profile")
+async def profile_cmd(msg: Message):
+    user = await asyncio.to_thread(get_user_by_tg_id, msg.from_user.id)
+
+    if not user or user.role != RoleEnum.admin:
+        await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
+        return
+
+    arg = (msg.text or "").split(maxsplit=1)[1:]
+    arg = arg[0].strip() if arg else "30"
+
+    if arg == "stop":
+        if not profiler.running:
+            await msg.answer("Профилировщик не запущен.")
+            return
+        # результаты отправит обработчик, который его запустил
+        await asyncio.to_thread(profiler.stop)
+        return
+
+    if profiler.running:
+        await msg.answer("Профилировщик уже запущен. Остановить: /profile stop")
+        return
+
+    try:
+        seconds = profiler.start(float(arg), loop=asyncio.get_running_loop())
+    except ValueError:
+        await msg.answer("Использование: /profile [секунд] или /profile stop")
+        return
+
+    await msg.answer(f"Профилировщик запущен на {seconds:.0f} с.")
+
+    # ждём в фоне, чтобы не занимать обработчик апдейтов на всё окно
+    global _profile_task
+    _profile_task = asyncio.create_task(send_profile(msg))
+
+
+async def send_profile(msg: Message):
+    await asyncio.to_thread(profiler.join)
+
+    info = profiler.info()
+    await msg.answer(f"Профилирование завершено, сэмплов: {info['ticks']}.")
+    await msg.answer_document(
+        BufferedInputFile(profiler.collapsed().encode(), filename="bot.collapsed.txt")
+    )
+    await msg.answer_document(
+        BufferedInputFile(profiler.pstats_bytes(), filename="bot.pstats")
+    )
+
+
+# ---------------------------------------------------------
+# /stats — состояние процесса бота (для админов)
+# ---------------------------------------------------------
+
+@text_router.command("stats")
+async def stats_cmd(msg: Message):
+    user = await asyncio.to_thread(get_user_by_tg_id, msg.from_user.id)
+
+    if not user or user.role != RoleEnum.admin:
+        await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
+        return
+
+    cache = status_cache.stats()
+    await msg.answer(
+        "📊 Кэш статуса:\n"
+        f"статус: {cache['status']} (версия {cache['version']})\n"
+        f"возраст: {cache['age']:.1f} с (граница {cache['max_staleness']:.0f} с)\n"
+        f"источник изменений: {cache['watcher']}\n"
+        f"чтений: {cache['reads']}, обновлений: {cache['refreshes']}, "
+        f"уведомлений: {cache['notifications']}"
+    )
+
+    ex = update_executor.stats()
+    queues = sorted(update_executor.queue_lengths().items(), key=lambda kv: -kv[1])[:10]
+    lines = "\n".join(f"  {chat}: {n}" for chat, n in queues) or "  —"
+    await msg.answer(
+        "⚙️ Обработка апдейтов:\n"
+        f"в работе: {ex['active']}/{ex['workers']}, "
+        f"в очереди: {ex['pending']}/{ex['max_queue']}, чатов: {ex['chats']}\n"
+        f"обработано: {ex['processed']}\n"
+        f"очереди по чатам:\n{lines}"
+    )
+
+    notes = status_notifier.stats()
+    await msg.answer(
+        "🔔 Уведомления о выключении:\n"
+        f"ожидает отправки: {'да' if notes['pending'] else 'нет'}\n"
+        f"схлопнуто переключений: {notes['coalesced']}\n"
+        f"отправлено: {notes['sent']}, отредактировано: {notes['edited']}"
+    )
+
+    api = bot.session.stats()
+    endpoints = "\n".join(
+        f"  {name}: {e['calls']} выз., ошибок {e['errors']}, повторов {e['retries']}, "
+        f"отброшено {e['dropped']}, "
+        f"p50 {e['p50_ms']} мс, p95 {e['p95_ms']} мс"
+        for name, e in api["endpoints"].items()
+    ) or "  —"
+    await msg.answer(
+        "🌐 Bot API:\n"
+        f"предохранитель: {api['breaker']} (срабатываний: {api['breaker_trips']})\n"
+        f"{endpoints}"
+    )
+
+
 # ---------------------------------------------------------
 # Команда /start
 # ---------------------------------------------------------
 
-@dp.message(CommandStart())
+@text_router.command("start")
 async def start_cmd(msg: Message):
     tg_id = msg.from_user.id
     user = await asyncio.to_thread(get_user_by_tg_id, tg_id)
@@ -169,7 +294,7 @@ async def start_cmd(msg: Message):
             reply_markup=guest_request_keyboard()
         )
 
-    st = await asyncio.to_thread(get_status)
+    st = status_cache.get()
 
     await msg.answer(
         f"Текущий статус оборудования: {'ВКЛ' if st.status == 'on' else 'ВЫКЛ'}",
@@ -179,52 +304,51 @@ async def start_cmd(msg: Message):
 
 
 
+# ---------------------------------------------------------
+# Смена статуса: запись, отмена напоминаний, уведомление
+# ---------------------------------------------------------
+
+async def change_status(new_status: str, actor_id: int):
+    old_status = status_cache.get().status
+    await status_cache.set_status(new_status, actor_id)
+    cancel_reminders()
+    # рассылка уйдёт после паузы, быстрые переключения схлопнутся
+    status_notifier.status_changed(old_status, new_status, actor_id)
+
+
 # ---------------------------------------------------------
 # Команды /status /on /off
 # ---------------------------------------------------------
 
-@dp.message(Command("status"))
+@text_router.command("status")
 async def status_cmd(msg: Message):
-    st = await asyncio.to_thread(get_status)
+    st = status_cache.get()
     await msg.answer(f"Статус оборудования: {'ВКЛ' if st.status == 'on' else 'ВЫКЛ'}")
 
 
-@dp.message(Command("on"))
+@text_router.command("on")
 async def cmd_on(msg: Message):
 
     if not await user_has_access(msg.from_user.id):
         await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
         return
 
-    await asyncio.to_thread(set_status, "on", msg.from_user.id)
-    cancel_reminders()
+    await change_status("on", msg.from_user.id)
 
     await msg.answer("Статус оборудования: ВКЛЮЧЕНО")
 
 
-@dp.message(Command("off"))
+@text_router.command("off")
 async def cmd_off(msg: Message):
 
     if not await user_has_access(msg.from_user.id):
         await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
         return
 
-    await asyncio.to_thread(set_status, "off", msg.from_user.id)
-    cancel_reminders()
+    await change_status("off", msg.from_user.id)
 
     await msg.answer("Статус оборудования: ВЫКЛЮЧЕНО")
 
-    actor = await asyncio.to_thread(get_user_by_tg_id, msg.from_user.id)
-    name = actor.name or actor.tg_id
-
-    receivers = await asyncio.to_thread(get_all_receivers)
-    for uid in receivers:
-        try:
-            await bot.send_message(uid, f"⚠️ Оборудование выключено пользователем: {name}")
-        except:
-            pass
-
-
 
 # ---------------------------------------------------------
 # Inline — set_on
@@ -241,8 +365,7 @@ async def inline_on(query):
         await query.answer()
         return
 
-    await asyncio.to_thread(set_status, "on", query.from_user.id)
-    cancel_reminders()
+    await change_status("on", query.from_user.id)
 
     await query.message.edit_text(
         "Статус оборудования: ВКЛЮЧЕНО",
@@ -266,8 +389,7 @@ async def inline_off(query):
         await query.answer()
         return
 
-    await asyncio.to_thread(set_status, "off", query.from_user.id)
-    cancel_reminders()
+    await change_status("off", query.from_user.id)
 
     await query.message.edit_text(
         "Статус оборудования: ВЫКЛЮЧЕНО",
@@ -275,25 +397,14 @@ async def inline_off(query):
     )
     await query.answer("Готово.")
 
-    actor = await asyncio.to_thread(get_user_by_tg_id, query.from_user.id)
-    name = actor.name or actor.tg_id
-
-    receivers = await asyncio.to_thread(get_all_receivers)
-    for uid in receivers:
-        try:
-            await bot.send_message(uid, f"⚠️ Оборудование выключено пользователем: {name}")
-        except:
-            pass
-
-
 
 # ---------------------------------------------------------
 # Reply — Проверить статус
 # ---------------------------------------------------------
 
-@dp.message(F.text == "Проверить статус")
+@text_router.text("Проверить статус")
 async def reply_status(msg: Message):
-    st = await asyncio.to_thread(get_status)
+    st = status_cache.get()
     await msg.answer(
         f"Статус оборудования: {'ВКЛ' if st.status == 'on' else 'ВЫКЛ'}",
         reply_markup=status_keyboard()
@@ -304,29 +415,19 @@ async def reply_status(msg: Message):
 # Reply — Выключить
 # ---------------------------------------------------------
 
-@dp.message(F.text == "Оборудование выключено")
+@text_router.text("Оборудование выключено")
 async def reply_turn_off(msg: Message):
 
     if not await user_has_access(msg.from_user.id):
         await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
         return
 
-    st = await asyncio.to_thread(get_status)
+    st = status_cache.get()
     if st.status == "off":
         await msg.answer("Оборудование уже выключено.")
         return
 
-    await asyncio.to_thread(set_status, "off", msg.from_user.id)
-
-    actor = await asyncio.to_thread(get_user_by_tg_id, msg.from_user.id)
-    name = actor.name or actor.tg_id
-
-    receivers = await asyncio.to_thread(get_all_receivers)
-    for uid in receivers:
-        try:
-            await bot.send_message(uid, f"⚠️ Оборудование выключено пользователем: {name}")
-        except:
-            pass
+    await change_status("off", msg.from_user.id)
 
     await msg.answer("Оборудование выключено!")
 
@@ -335,19 +436,19 @@ async def reply_turn_off(msg: Message):
 # Reply — Включить
 # ---------------------------------------------------------
 
-@dp.message(F.text == "Оборудование включено")
+@text_router.text("Оборудование включено")
 async def reply_turn_on(msg: Message):
 
     if not await user_has_access(msg.from_user.id):
         await msg.answer(unauthorized_message(), reply_markup=guest_request_keyboard())
         return
 
-    st = await asyncio.to_thread(get_status)
+    st = status_cache.get()
     if st.status == "on":
         await msg.answer("Оборудование уже включено.")
         return
 
-    await asyncio.to_thread(set_status, "on", msg.from_user.id)
+    await change_status("on", msg.from_user.id)
     await msg.answer("Оборудование включено!")
 
 
@@ -357,6 +458,8 @@ async def reply_turn_on(msg: Message):
 
 async def main():
     init_db()
+    audit.start()
+    await status_cache.start()
     setup_scheduler()
     await bot.set_my_commands([
         BotCommand(command="start", description="Запуск бота"),
@@ -365,8 +468,19 @@ async def main():
         BotCommand(command="off", description="Выключить оборудование"),
     ])
 
+    text_router.username = (await bot.me()).username
+
     logger.info("Bot started...")
-    await dp.start_polling(bot)
+    try:
+        # апдейты раздаёт ChatOrderedMiddleware, polling только ставит их в очередь
+        # сессию закрываем сами: после polling ещё отправляются сообщения
+        await dp.start_polling(bot, handle_as_tasks=False, close_bot_session=False)
+    finally:
+        await update_executor.join()
+        await status_notifier.flush()
+        await status_cache.stop()
+        await audit.stop()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 # app/bot/bot_instance.py
 from aiogram import Bot
 from app.config import TELEGRAM_TOKEN
+from app.bot.transport import create_session
 
 if not TELEGRAM_TOKEN:
     raise RuntimeError("TELEGRAM_TOKEN is not set. Set TELEGRAM_TOKEN in environment or .env")
 
-bot = Bot(token=TELEGRAM_TOKEN)
+bot = Bot(token=TELEGRAM_TOKEN, session=create_session())
@@ -0,0 +1,103 @@
+# app/bot/executor.py
+# Обработка апдейтов: разные чаты — параллельно, внутри одного чата —
+# строго по порядку. Общее число одновременно работающих обработчиков
+# и общая глубина очереди ограничены.
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.config import UPDATE_WORKERS, UPDATE_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+class ChatOrderedExecutor:
+
+    def __init__(self, workers: int = UPDATE_WORKERS, max_queue: int = UPDATE_QUEUE_DEPTH):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._worker_slots = asyncio.Semaphore(workers)
+        self._queue_slots = asyncio.Semaphore(max_queue)
+        self._queues: Dict[int, deque] = {}
+        self._drainers: Dict[int, asyncio.Task] = {}
+        self.pending = 0
+        self.active = 0
+        self.processed = 0
+
+    async def submit(self, key: int, job: Job):
+        # очередь заполнена — ждём здесь, и polling перестаёт забирать апдейты
+        await self._queue_slots.acquire()
+        self.pending += 1
+
+        self._queues.setdefault(key, deque()).append(job)
+        if key not in self._drainers:
+            self._drainers[key] = asyncio.create_task(self._drain(key))
+
+    async def _drain(self, key: int):
+        queue = self._queues[key]
+        try:
+            while queue:
+                job = queue.popleft()
+                async with self._worker_slots:
+                    self.active += 1
+                    try:
+                        await job()
+                    except Exception as e:
+                        logger.exception("Update handler failed (chat=%s): %s", key, e)
+                    finally:
+                        self.active -= 1
+                        self.pending -= 1
+                        self.processed += 1
+                        self._queue_slots.release()
+        finally:
+            del self._queues[key]
+            del self._drainers[key]
+
+    async def join(self):
+        while self._drainers:
+            await asyncio.gather(*self._drainers.values(), return_exceptions=True)
+
+    def queue_lengths(self) -> Dict[int, int]:
+        # ожидающие апдейты по чатам (без уже выполняющегося)
+        return {key: len(q) for key, q in self._queues.items()}
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "pending": self.pending,
+            "max_queue": self.max_queue,
+            "chats": len(self._queues),
+            "processed": self.processed,
+        }
+
+
+class ChatOrderedMiddleware(BaseMiddleware):
+    # outer-middleware для dp.update: передаёт обработку апдейта
+    # в executor и сразу возвращает управление polling'у
+
+    def __init__(self, executor: ChatOrderedExecutor):
+        self.executor = executor
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat else (user.id if user else 0)
+
+        await self.executor.submit(key, lambda: handler(event, data))
+        return None
+
+
+# один executor на процесс бота
+update_executor = ChatOrderedExecutor()
@@ -0,0 +1,118 @@
+# app/bot/notifier.py
+# Уведомления о смене статуса с задержкой (debounce): быстрые
+# переключения вкл/выкл сворачиваются в одно сообщение с итоговым
+# состоянием, а недавнее сообщение получателю редактируется, а не дублируется.
+import asyncio
+import logging
+import time
+
+from app.config import NOTIFY_DEBOUNCE_SECONDS, NOTIFY_EDIT_WINDOW_SECONDS
+from app.db import get_all_receivers, get_user_by_tg_id
+from app.models import now_moscow
+from app.bot.bot_instance import bot
+
+logger = logging.getLogger(__name__)
+
+
+class StatusNotifier:
+
+    def __init__(
+            self,
+            debounce: float = NOTIFY_DEBOUNCE_SECONDS,
+            edit_window: float = NOTIFY_EDIT_WINDOW_SECONDS
+    ):
+        self.debounce = debounce
+        # дольше этого не откладываем, даже если переключают без остановки
+        self.max_wait = debounce * 4
+        self.edit_window = edit_window
+        self._before: str | None = None
+        self._final: tuple[str, int | str] | None = None
+        self._first_at = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._task: asyncio.Task | None = None
+        # uid -> (message_id, когда отправлено)
+        self._sent: dict[int, tuple[int, float]] = {}
+        self.coalesced = 0
+        self.sent = 0
+        self.edited = 0
+
+    def status_changed(self, old_status: str, new_status: str, actor_id: int | str):
+        now = time.monotonic()
+        if self._final is None:
+            self._before = old_status
+            self._first_at = now
+        else:
+            self.coalesced += 1
+        self._final = (new_status, actor_id)
+
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, min(self.debounce, self._first_at + self.max_wait - now))
+        self._timer = asyncio.get_running_loop().call_later(delay, self._fire)
+
+    def _fire(self):
+        self._timer = None
+        self._task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._final is None:
+            return
+
+        (new_status, actor_id), before = self._final, self._before
+        self._final = self._before = None
+
+        # вернулись туда, откуда начали, — сообщать не о чем;
+        # как и раньше, рассылаем только выключение
+        if new_status == before or new_status != "off":
+            return
+
+        try:
+            actor = await asyncio.to_thread(get_user_by_tg_id, actor_id)
+            receivers = await asyncio.to_thread(get_all_receivers)
+        except Exception as e:
+            logger.exception("Failed to prepare status notification: %s", e)
+            return
+
+        name = (actor.name or actor.telegram_id) if actor else str(actor_id)
+        text = (
+            f"⚠️ Оборудование выключено пользователем: {name} "
+            f"({now_moscow().strftime('%H:%M')})"
+        )
+
+        for uid in receivers:
+            await self._deliver(uid, text)
+
+    async def _deliver(self, uid: int, text: str):
+        now = time.monotonic()
+        prev = self._sent.get(uid)
+
+        if prev and now - prev[1] < self.edit_window:
+            try:
+                await bot.edit_message_text(text, chat_id=uid, message_id=prev[0])
+                self.edited += 1
+                return
+            except Exception as e:
+                # сообщение удалено, слишком старое и т.п. — отправим новое
+                logger.debug("Failed to edit notification for %s: %s", uid, e)
+
+        try:
+            msg = await bot.send_message(uid, text)
+            self._sent[uid] = (msg.message_id, now)
+            self.sent += 1
+        except Exception as e:
+            logger.warning("Failed to notify %s: %s", uid, e)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._final is not None,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "edited": self.edited,
+        }
+
+
+# один на процесс бота
+status_notifier = StatusNotifier()
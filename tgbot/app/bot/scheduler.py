@@ -1,24 +1,90 @@
 # scheduler.py
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 import logging
-from typing import List
 
 from app.holidays import is_non_working
-from app.db import get_status, set_status, get_all_receivers
+from app.db import get_all_receivers, get_receivers, get_escalation_policy
+from app.models import RoleEnum
 from app.bot.bot_instance import bot
+from app.bot.status_cache import status_cache
 
 logger = logging.getLogger(__name__)
 
 scheduler = AsyncIOScheduler()
-reminder_jobs: List = []
 
+# время вечерней проверки — начало лестницы напоминаний
+EVENING_CHECK_HOUR = 20
+EVENING_CHECK_MINUTE = 0
 
-async def send_warning():
+# ---------------------------------------------------------
+# Лестница напоминаний: в каждый момент запланирован только
+# следующий шаг (один таймер), поэтому отмена — O(1)
+# ---------------------------------------------------------
+
+_ladder_start: datetime | None = None
+_pending_step: asyncio.TimerHandle | None = None
+_step_task: asyncio.Task | None = None
+
+
+def parse_step_roles(raw: str | None) -> list[list[RoleEnum]]:
+    steps = []
+    for chunk in (raw or "").split(";"):
+        roles = []
+        for name in chunk.split(","):
+            try:
+                roles.append(RoleEnum(name.strip()))
+            except ValueError:
+                continue
+        if roles:
+            steps.append(roles)
+    return steps or [[RoleEnum.admin, RoleEnum.notifier]]
+
+
+def parse_stop_at(raw: str | None) -> tuple[int, int] | None:
+    if not raw:
+        return None
     try:
-        receivers = await asyncio.to_thread(get_all_receivers)
+        hour, minute = map(int, raw.split(":"))
+        if not (0 <= hour < 24 and 0 <= minute < 60):
+            raise ValueError(raw)
+    except ValueError:
+        # кривое значение в БД не должно ронять лестницу — просто без ограничения
+        logger.warning("Invalid escalation stop_at %r, ignoring", raw)
+        return None
+    return hour, minute
+
+
+def escalation_steps(policy, start: datetime) -> list[tuple[datetime, list[RoleEnum]]]:
+    # моменты напоминаний: start, start + d, start + d + d*k, ...
+    roles = parse_step_roles(policy.step_roles)
+    stop = None
+    stop_at = parse_stop_at(policy.stop_at)
+    if stop_at is not None:
+        stop = start.replace(hour=stop_at[0], minute=stop_at[1], second=0, microsecond=0)
+
+    steps = []
+    at = start
+    delay = float(policy.first_delay_min or 0)
+    for i in range(policy.max_steps or 0):
+        if stop is not None and at > stop:
+            break
+        steps.append((at, roles[min(i, len(roles) - 1)]))
+        if delay <= 0:
+            break
+        at = at + timedelta(minutes=delay)
+        delay *= policy.backoff or 1.0
+    return steps
+
+
+async def send_warning(roles: list[RoleEnum] | None = None):
+    try:
+        if roles is None:
+            receivers = await asyncio.to_thread(get_all_receivers)
+        else:
+            receivers = await asyncio.to_thread(get_receivers, roles)
     except Exception as e:
         logger.exception("Failed to fetch receivers: %s", e)
         return
@@ -34,66 +100,118 @@ async def send_warning():
 
 
 def cancel_reminders():
-    global reminder_jobs
-    for job in reminder_jobs:
-        try:
-            job.remove()
-        except Exception as e:
-            logger.debug("Failed to remove job %s: %s", getattr(job, 'id', job), e)
-    reminder_jobs = []
+    global _pending_step, _ladder_start, _step_task
+    if _pending_step is not None:
+        _pending_step.cancel()
+        _pending_step = None
+    # шаг, который уже рассылает, тоже останавливаем (но не самого себя)
+    if _step_task is not None and not _step_task.done() and _step_task is not asyncio.current_task():
+        _step_task.cancel()
+    _step_task = None
+    _ladder_start = None
 
 
-async def evening_check():
-    today = datetime.now().date()
+def _schedule_step(index: int, at: datetime):
+    global _pending_step
+    loop = asyncio.get_running_loop()
+    delay = max(0.0, (at - datetime.now()).total_seconds())
+    _pending_step = loop.call_later(delay, _fire_step, index)
+    logger.debug("Escalation step %d scheduled at %s", index, at.strftime("%H:%M"))
 
-    if is_non_working(today):
-        logger.debug("Today is non-working, skipping evening_check")
+
+def _fire_step(index: int):
+    global _pending_step, _step_task
+    _pending_step = None
+    _step_task = asyncio.create_task(run_escalation_step(index))
+
+
+async def run_escalation_step(index: int):
+    # политика и статус читаются заново на каждом шаге
+    start = _ladder_start
+    if start is None:
+        return
+
+    status = status_cache.get()
+    if status.status == "off":
+        cancel_reminders()
         return
 
     try:
-        status = await asyncio.to_thread(get_status)
+        policy = await asyncio.to_thread(get_escalation_policy)
     except Exception as e:
-        logger.exception("Failed to get status in evening_check: %s", e)
+        logger.exception("Failed to load escalation policy: %s", e)
         return
 
-    if not status or status.status == "off":
+    if policy is None:
         cancel_reminders()
         return
 
-    await send_warning()
-    schedule_repeating_warnings()
+    steps = escalation_steps(policy, start)
+    if index >= len(steps):
+        cancel_reminders()
+        return
 
+    await send_warning(steps[index][1])
+
+    # пропущенные шаги (задержка, перезапуск) не догоняем
+    now = datetime.now()
+    for j in range(index + 1, len(steps)):
+        if steps[j][0] >= now:
+            _schedule_step(j, steps[j][0])
+            return
 
-def schedule_repeating_warnings():
-    global reminder_jobs
     cancel_reminders()
 
-    for t in ["20:30", "21:00", "21:30"]:
-        hour, minute = map(int, t.split(":"))
-        try:
-            job = scheduler.add_job(
-                repeat_warning,
-                CronTrigger(hour=hour, minute=minute),
-                id=f"repeat_{hour}_{minute}"
-            )
-            reminder_jobs.append(job)
-            logger.debug("Scheduled repeat_warning at %02d:%02d (id=%s)", hour, minute, job.id)
-        except Exception as e:
-            logger.exception("Failed to schedule repeat_warning for %s: %s", t, e)
 
+async def start_escalation(start: datetime):
+    global _ladder_start
+    cancel_reminders()
+    _ladder_start = start
 
-async def repeat_warning():
     try:
-        status = await asyncio.to_thread(get_status)
+        policy = await asyncio.to_thread(get_escalation_policy)
     except Exception as e:
-        logger.exception("Failed to get status in repeat_warning: %s", e)
+        logger.exception("Failed to load escalation policy: %s", e)
         return
 
+    if policy is None:
+        return
+
+    # первый шаг, который ещё не прошёл (после перезапуска бота — не с начала)
+    now = datetime.now()
+    for index, (at, _) in enumerate(escalation_steps(policy, start)):
+        if at >= now - timedelta(minutes=1):
+            _schedule_step(index, at)
+            return
+
+
+async def evening_check():
+    today = datetime.now().date()
+
+    if is_non_working(today):
+        logger.debug("Today is non-working, skipping evening_check")
+        return
+
+    status = status_cache.get()
+
     if not status or status.status == "off":
         cancel_reminders()
         return
 
-    await send_warning()
+    await start_escalation(datetime.now().replace(second=0, microsecond=0))
+
+
+async def resume_escalation():
+    # бот перезапустили посреди вечера — продолжаем лестницу с нужного шага
+    now = datetime.now()
+    start = now.replace(hour=EVENING_CHECK_HOUR, minute=EVENING_CHECK_MINUTE, second=0, microsecond=0)
+
+    if now < start or is_non_working(now.date()):
+        return
+    if status_cache.get().status == "off":
+        return
+
+    await start_escalation(start)
 
 
 async def morning_enable():
@@ -103,7 +221,7 @@ async def morning_enable():
         return
 
     try:
-        await asyncio.to_thread(set_status, "on", "auto")
+        await status_cache.set_status("on", "auto")
     except Exception as e:
         logger.exception("Failed to set status in morning_enable: %s", e)
         return
@@ -122,6 +240,7 @@ async def morning_enable():
 
 
 def setup_scheduler():
+    global _step_task
     try:
         # ---- ПАТЧ: добавлено replace_existing=True ----
         scheduler.add_job(
@@ -132,7 +251,7 @@ def setup_scheduler():
         )
         scheduler.add_job(
             evening_check,
-            CronTrigger(hour=20, minute=0),
+            CronTrigger(hour=EVENING_CHECK_HOUR, minute=EVENING_CHECK_MINUTE),
             id="evening_check",
             replace_existing=True
         )
@@ -140,5 +259,7 @@ def setup_scheduler():
 
         scheduler.start()
         logger.info("Scheduler started with jobs: %s", [j.id for j in scheduler.get_jobs()])
+
+        _step_task = asyncio.create_task(resume_escalation())
     except Exception as e:
         logger.exception("Failed to start scheduler: %s", e)
@@ -0,0 +1,221 @@
+# app/bot/status_cache.py
+# Снимок статуса оборудования в памяти бота.
+# Читается без обращения к БД, обновляется при записи (write-through)
+# и по уведомлениям об изменениях: LISTEN/NOTIFY на PostgreSQL,
+# опрос PRAGMA data_version на SQLite.
+import asyncio
+import logging
+import select
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.config import STATUS_CACHE_POLL_INTERVAL, STATUS_CACHE_MAX_STALENESS
+from app.db import engine, get_status, set_status, STATUS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    status: str
+    updated_by: str | None
+    updated_at: datetime | None
+    version: int
+
+
+class StatusCache:
+
+    def __init__(
+            self,
+            poll_interval: float = STATUS_CACHE_POLL_INTERVAL,
+            max_staleness: float = STATUS_CACHE_MAX_STALENESS
+    ):
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self._snapshot = StatusSnapshot("off", None, None, 0)
+        self._refreshed_at = 0.0
+        self._confirmed_at = 0.0
+        self._dirty = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._refresh_task: asyncio.Task | None = None
+        self._safety_task: asyncio.Task | None = None
+        self._watcher: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.reads = 0
+        self.refreshes = 0
+        self.notifications = 0
+
+    # -----------------------------------------------------
+    # Чтение / запись
+    # -----------------------------------------------------
+
+    def get(self) -> StatusSnapshot:
+        self.reads += 1
+        return self._snapshot
+
+    async def set_status(self, new_status: str, actor_id: int | str) -> StatusSnapshot:
+        st = await asyncio.to_thread(set_status, new_status, actor_id)
+        return self._apply(st)
+
+    async def refresh(self) -> StatusSnapshot:
+        self._dirty = False
+        st = await asyncio.to_thread(get_status, True)
+        self.refreshes += 1
+        return self._apply(st)
+
+    def _apply(self, st) -> StatusSnapshot:
+        if st is None:
+            return self._snapshot
+
+        cur = self._snapshot
+        if (st.status, st.updated_by, st.updated_at) != (cur.status, cur.updated_by, cur.updated_at):
+            self._snapshot = StatusSnapshot(st.status, st.updated_by, st.updated_at, cur.version + 1)
+        self._refreshed_at = time.monotonic()
+        return self._snapshot
+
+    # -----------------------------------------------------
+    # Устаревание
+    # -----------------------------------------------------
+
+    def age(self) -> float:
+        # сколько секунд назад снимок последний раз сверялся с БД
+        return time.monotonic() - max(self._refreshed_at, self._confirmed_at)
+
+    def stats(self) -> dict:
+        return {
+            "status": self._snapshot.status,
+            "version": self._snapshot.version,
+            "age": round(self.age(), 3),
+            "max_staleness": self.max_staleness,
+            "watcher": engine.dialect.name if self._watcher and self._watcher.is_alive() else "none",
+            "reads": self.reads,
+            "refreshes": self.refreshes,
+            "notifications": self.notifications,
+        }
+
+    # -----------------------------------------------------
+    # Запуск / остановка
+    # -----------------------------------------------------
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.refresh()
+
+        target = {
+            "postgresql": self._listen_postgres,
+            "sqlite": self._poll_sqlite,
+        }.get(engine.dialect.name)
+
+        if target is not None:
+            self._stop.clear()
+            self._watcher = threading.Thread(target=target, name="status-watcher", daemon=True)
+            self._watcher.start()
+
+        # страховка: даже без уведомлений снимок не старше max_staleness
+        self._safety_task = asyncio.create_task(self._safety_refresh())
+
+    async def stop(self):
+        self._stop.set()
+        if self._safety_task:
+            self._safety_task.cancel()
+        if self._watcher:
+            await asyncio.to_thread(self._watcher.join, self.poll_interval * 2)
+
+    async def _safety_refresh(self):
+        while True:
+            await asyncio.sleep(self.max_staleness / 2)
+            if self.age() >= self.max_staleness / 2:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.warning("Status cache refresh failed (age=%.1fs): %s", self.age(), e)
+
+            if self.age() > self.max_staleness:
+                logger.warning("Status cache is stale: %.1fs > %.1fs", self.age(), self.max_staleness)
+
+    # -----------------------------------------------------
+    # Уведомления об изменениях (фоновый поток)
+    # -----------------------------------------------------
+
+    def _changed(self):
+        self.notifications += 1
+        self._dirty = True
+        self._loop.call_soon_threadsafe(self._schedule_refresh)
+
+    def _confirm(self):
+        # изменений не было — снимок актуален
+        if not self._dirty:
+            self._confirmed_at = time.monotonic()
+
+    def _schedule_refresh(self):
+        # уже обновляемся — цикл ниже сам увидит новый _dirty
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_while_dirty())
+
+    async def _refresh_while_dirty(self):
+        while self._dirty:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Status cache refresh failed: %s", e)
+                return
+
+    def _listen_postgres(self):
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {STATUS_CHANNEL}")
+                # между переподключениями могли пропустить уведомление
+                self._changed()
+
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([conn], [], [], self.poll_interval)
+                    if ready:
+                        conn.poll()
+                        if conn.notifies:
+                            conn.notifies.clear()
+                            self._changed()
+                            continue
+                    self._confirm()
+            except Exception as e:
+                logger.warning("Status LISTEN connection failed: %s", e)
+                self._stop.wait(self.poll_interval)
+            finally:
+                if raw is not None:
+                    # соединение в autocommit обратно в пул не возвращаем
+                    raw.invalidate()
+
+    def _poll_sqlite(self):
+        path = engine.url.database
+        if not path or path == ":memory:":
+            return
+
+        while not self._stop.is_set():
+            try:
+                conn = sqlite3.connect(path)
+                try:
+                    version = conn.execute("PRAGMA data_version").fetchone()[0]
+                    while not self._stop.wait(self.poll_interval):
+                        current = conn.execute("PRAGMA data_version").fetchone()[0]
+                        if current != version:
+                            version = current
+                            self._changed()
+                        else:
+                            self._confirm()
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.warning("Status version poll failed: %s", e)
+                self._stop.wait(self.poll_interval)
+
+
+# один снимок на процесс бота
+status_cache = StatusCache()
@@ -0,0 +1,52 @@
+# app/bot/text_router.py
+# Маршрутизация текстовых сообщений одним поиском в словаре
+# вместо цепочки фильтров F.text == ... / Command(...).
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.types import Message
+
+Handler = Callable[[Message], Awaitable[Any]]
+
+
+class TextRouter:
+
+    def __init__(self):
+        self._texts: Dict[str, Handler] = {}
+        self._commands: Dict[str, Handler] = {}
+        # для "/cmd@botname" в группах: чужие упоминания пропускаем
+        self.username: str | None = None
+
+    def text(self, *texts: str):
+        def register(handler: Handler) -> Handler:
+            for t in texts:
+                self._texts[t] = handler
+            return handler
+        return register
+
+    def command(self, *names: str):
+        def register(handler: Handler) -> Handler:
+            for name in names:
+                self._commands[name] = handler
+            return handler
+        return register
+
+    def resolve(self, text: str | None) -> Handler | None:
+        if not text:
+            return None
+
+        if text[0] == "/":
+            head = text.split(maxsplit=1)[0]
+            name, _, mention = head[1:].partition("@")
+            if mention and self.username and mention.lower() != self.username.lower():
+                return None
+            return self._commands.get(name)
+
+        return self._texts.get(text.strip())
+
+    async def dispatch(self, message: Message) -> Any:
+        handler = self.resolve(message.text)
+        if handler is None:
+            # ничего не подошло — дальше не проверяем
+            return UNHANDLED
+        return await handler(message)
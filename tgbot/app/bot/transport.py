@@ -0,0 +1,247 @@
+# app/bot/transport.py
+# HTTP-сессия aiogram с пулом соединений, повторами с джиттером
+# и автоматом-предохранителем (circuit breaker) для Bot API.
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Dict, Optional
+
+from aiohttp import ClientConnectorError
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer, PRODUCTION
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+    TelegramEntityTooLarge
+)
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.config import (
+    TELEGRAM_API_URL,
+    TELEGRAM_POOL_SIZE,
+    TELEGRAM_KEEPALIVE,
+    TELEGRAM_RETRY_ATTEMPTS,
+    TELEGRAM_RETRY_BASE,
+    TELEGRAM_RETRY_CAP,
+    TELEGRAM_MAX_RETRY_AFTER,
+    TELEGRAM_BREAKER_THRESHOLD,
+    TELEGRAM_BREAKER_COOLDOWN
+)
+
+logger = logging.getLogger(__name__)
+
+# long polling сам делает backoff, повторять его здесь не нужно
+_NO_RETRY_METHODS = {"getUpdates"}
+
+# повтор после таймаута или обрыва может доставить сообщение дважды
+_NON_IDEMPOTENT_PREFIXES = ("send", "forward", "copy")
+
+
+def _safe_to_retry(name: str, error: TelegramNetworkError) -> bool:
+    if not name.startswith(_NON_IDEMPOTENT_PREFIXES):
+        return True
+    # сообщение точно не ушло, только если не удалось соединиться
+    return isinstance(error.__context__, ClientConnectorError)
+
+
+class CircuitOpenError(TelegramNetworkError):
+    label = "Circuit breaker says"
+
+
+class CircuitBreaker:
+    # closed -> (threshold подряд ошибок) -> open -> (cooldown) -> half-open:
+    # пропускаем один пробный запрос; успех закрывает, ошибка снова открывает.
+    # Используется только из event loop бота.
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe: asyncio.Task | None = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and self._probe is None:
+            self._probe = asyncio.current_task()
+            return True
+        return False
+
+    def release(self):
+        # пробный запрос закончился без вердикта (отмена, неожиданная ошибка):
+        # состояние не меняем, следующий запрос сможет стать пробным
+        if self._probe is not None and self._probe is asyncio.current_task():
+            self._probe = None
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe = None
+
+    def failure(self):
+        self.failures += 1
+        self._probe = None
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.opened_at is None:
+                self.trips += 1
+                logger.warning("Telegram API circuit opened after %d failures", self.failures)
+            self.opened_at = time.monotonic()
+
+
+class EndpointStats:
+
+    def __init__(self, window: int = 512):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        # отброшены предохранителем, в задержки не попадают
+        self.dropped = 0
+        self.latencies: deque = deque(maxlen=window)
+
+    def observe(self, seconds: float, ok: bool):
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        self.latencies.append(seconds)
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+
+        def pct(p: float) -> float:
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 1) if lat else 0.0
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "dropped": self.dropped,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(lat[-1] * 1000, 1) if lat else 0.0,
+        }
+
+
+class ResilientSession(AiohttpSession):
+
+    def __init__(
+            self,
+            attempts: int = TELEGRAM_RETRY_ATTEMPTS,
+            backoff_base: float = TELEGRAM_RETRY_BASE,
+            backoff_cap: float = TELEGRAM_RETRY_CAP,
+            max_retry_after: float = TELEGRAM_MAX_RETRY_AFTER,
+            breaker: Optional[CircuitBreaker] = None,
+            pool_size: int = TELEGRAM_POOL_SIZE,
+            keepalive: float = TELEGRAM_KEEPALIVE,
+            **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self.attempts = max(1, attempts)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.max_retry_after = max_retry_after
+        self.breaker = breaker or CircuitBreaker(TELEGRAM_BREAKER_THRESHOLD, TELEGRAM_BREAKER_COOLDOWN)
+        self.endpoints: Dict[str, EndpointStats] = {}
+
+        # все запросы идут на один хост: держим соединения открытыми
+        self._connector_init.update(
+            limit=pool_size,
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=300,
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: равномерно от 0 до base * 2^attempt
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def make_request(
+            self,
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+            timeout: Optional[int] = None
+    ) -> TelegramType:
+        name = method.__api_method__
+        stats = self.endpoints.setdefault(name, EndpointStats())
+
+        if name in _NO_RETRY_METHODS:
+            return await self._timed(stats, bot, method, timeout)
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                stats.dropped += 1
+                raise CircuitOpenError(method=method, message="Telegram API is degraded, request dropped")
+
+            try:
+                result = await self._timed(stats, bot, method, timeout)
+            except TelegramRetryAfter as e:
+                # flood control — это не поломка API, предохранитель не трогаем
+                self.breaker.success()
+                if attempt + 1 >= self.attempts or e.retry_after > self.max_retry_after:
+                    raise
+                delay = e.retry_after + random.uniform(0, 1)
+            except TelegramEntityTooLarge:
+                # 413 — это ответ API, а не сетевой сбой
+                self.breaker.success()
+                raise
+            except (TelegramNetworkError, TelegramServerError) as e:
+                self.breaker.failure()
+                if attempt + 1 >= self.attempts:
+                    raise
+                if isinstance(e, TelegramNetworkError) and not _safe_to_retry(name, e):
+                    raise
+                delay = self._backoff(attempt)
+                logger.debug("Retrying %s in %.2fs after %s", name, delay, e)
+            except TelegramAPIError:
+                # 4xx (бот заблокирован, неверный запрос...) — API ответил, значит живо
+                self.breaker.success()
+                raise
+            else:
+                self.breaker.success()
+                return result
+            finally:
+                self.breaker.release()
+
+            attempt += 1
+            stats.retries += 1
+            await asyncio.sleep(delay)
+
+    async def _timed(self, stats: EndpointStats, bot, method, timeout):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await super().make_request(bot, method, timeout)
+            ok = True
+            return result
+        finally:
+            stats.observe(time.perf_counter() - started, ok)
+
+    def stats(self) -> dict:
+        return {
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "endpoints": {name: s.summary() for name, s in sorted(self.endpoints.items())},
+        }
+
+
+def create_session() -> ResilientSession:
+    # TELEGRAM_API_URL — локальный Bot API сервер или фейковый для тестов
+    api = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else PRODUCTION
+    return ResilientSession(api=api)
@@ -9,5 +9,55 @@ TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN", "").strip()
 # но локально fallback на SQLite
 DB_URL = os.getenv("DB_URL") or "sqlite:///equipment.db"
 
+# Необязательные реплики только для чтения, через запятую.
+# Сразу после записи чтения этого процесса идут в основную БД.
+DB_READ_URLS = [u.strip() for u in os.getenv("DB_READ_URLS", "").split(",") if u.strip()]
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", "5"))
+
 ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "changeme").strip()
 INITIAL_NOTIFIERS = os.getenv("INITIAL_NOTIFIERS", "").strip()
+
+# Сэмплирующий профилировщик (/admin/profiler, /profile в боте)
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "300"))
+
+# Очередь журнала действий (app/audit.py)
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "1000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "50"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+# Кэш статуса в боте (app/bot/status_cache.py)
+STATUS_CACHE_POLL_INTERVAL = float(os.getenv("STATUS_CACHE_POLL_INTERVAL", "1.0"))
+STATUS_CACHE_MAX_STALENESS = float(os.getenv("STATUS_CACHE_MAX_STALENESS", "30"))
+
+# Обработка апдейтов бота (app/bot/executor.py)
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "16"))
+UPDATE_QUEUE_DEPTH = int(os.getenv("UPDATE_QUEUE_DEPTH", "1000"))
+
+# Кэш страниц админки (app/admin/render_cache.py)
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "64"))
+# None — системный temp-каталог
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR") or None
+
+# HTTP-сессия бота (app/bot/transport.py)
+# TELEGRAM_API_URL — например, http://localhost:8081 для локального/фейкового Bot API
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "").strip()
+TELEGRAM_POOL_SIZE = int(os.getenv("TELEGRAM_POOL_SIZE", "32"))
+TELEGRAM_KEEPALIVE = float(os.getenv("TELEGRAM_KEEPALIVE", "60"))
+TELEGRAM_RETRY_ATTEMPTS = int(os.getenv("TELEGRAM_RETRY_ATTEMPTS", "4"))
+TELEGRAM_RETRY_BASE = float(os.getenv("TELEGRAM_RETRY_BASE", "0.5"))
+TELEGRAM_RETRY_CAP = float(os.getenv("TELEGRAM_RETRY_CAP", "10"))
+TELEGRAM_MAX_RETRY_AFTER = float(os.getenv("TELEGRAM_MAX_RETRY_AFTER", "30"))
+TELEGRAM_BREAKER_THRESHOLD = int(os.getenv("TELEGRAM_BREAKER_THRESHOLD", "5"))
+TELEGRAM_BREAKER_COOLDOWN = float(os.getenv("TELEGRAM_BREAKER_COOLDOWN", "30"))
+
+# Уведомления о смене статуса (app/bot/notifier.py)
+NOTIFY_DEBOUNCE_SECONDS = float(os.getenv("NOTIFY_DEBOUNCE_SECONDS", "30"))
+# в течение этого времени предыдущее уведомление редактируется, а не дублируется
+NOTIFY_EDIT_WINDOW_SECONDS = float(os.getenv("NOTIFY_EDIT_WINDOW_SECONDS", "600"))
+
+# SQLite-профиль (app/db.py), если DB_URL указывает на файл SQLite
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "15"))
+SQLITE_CACHE_KB = int(os.getenv("SQLITE_CACHE_KB", "20000"))
+SQLITE_MMAP_MB = int(os.getenv("SQLITE_MMAP_MB", "256"))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
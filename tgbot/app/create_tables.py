@@ -1,6 +1,6 @@
-from app.db import Base, engine
+from app.db import ensure_schema
 
 def create_tables():
     print("🔧 Creating tables if they do not exist...")
-    Base.metadata.create_all(bind=engine)
+    ensure_schema()
     print("✔ Tables are ready")
@@ -1,9 +1,93 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from app.models import Base, User, SiteStatus, ActionLog, RoleEnum
-from app.config import DB_URL
+import contextvars
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dtime, timedelta
 
-engine = create_engine(DB_URL)
+from sqlalchemy import create_engine, event, text, tuple_
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+from app.models import (
+    Base, User, SiteStatus, ActionLog, RoleEnum, EscalationPolicy, DataVersion, now_moscow
+)
+from app.config import (
+    DB_URL,
+    DB_READ_URLS,
+    READ_STICKY_SECONDS,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_CACHE_KB,
+    SQLITE_MMAP_MB,
+    SQLITE_POOL_SIZE
+)
+
+
+# ---------------------------------------------------------
+# SQLite-профиль для запуска на одной машине: WAL, один писатель
+# ---------------------------------------------------------
+
+def is_file_sqlite(url: str) -> bool:
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and u.database not in (None, "", ":memory:")
+
+
+def create_sqlite_engine(url: str):
+    eng = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT},
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_POOL_SIZE
+    )
+
+    @event.listens_for(eng, "connect")
+    def _sqlite_pragmas(dbapi_conn, _record):
+        # BEGIN выдаём сами (см. ниже), pysqlite не должен вмешиваться
+        dbapi_conn.isolation_level = None
+        cur = dbapi_conn.cursor()
+        # читатели не блокируют писателя и наоборот
+        cur.execute("PRAGMA journal_mode=WAL")
+        # в WAL этого достаточно: потерять можно только последние транзакции при сбое ОС
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_KB}")
+        cur.execute(f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}")
+        cur.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.close()
+
+    @event.listens_for(eng, "begin")
+    def _sqlite_begin(conn):
+        # писатели берут блокировку сразу (IMMEDIATE): иначе повышение
+        # read -> write посреди транзакции даёт "database is locked" без ожидания
+        conn.exec_driver_sql("BEGIN " + conn.get_execution_options().get("sqlite_begin", "DEFERRED"))
+
+    return eng
+
+
+class SerializedWriteSession(Session):
+    # в процессе пишет только одна сессия за раз; между процессами
+    # (бот и админка) очередь держат BEGIN IMMEDIATE и busy_timeout
+    lock = threading.RLock()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock.acquire()
+        self._holds_lock = True
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._holds_lock:
+                self._holds_lock = False
+                self.lock.release()
+
+
+def create_db_engine(url: str):
+    return create_sqlite_engine(url) if is_file_sqlite(url) else create_engine(url)
+
+
+# основная БД: все записи
+engine = create_db_engine(DB_URL)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -12,20 +96,151 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+if is_file_sqlite(DB_URL):
+    WriteSession = sessionmaker(
+        bind=engine.execution_options(sqlite_begin="IMMEDIATE"),
+        class_=SerializedWriteSession,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False
+    )
+else:
+    WriteSession = SessionLocal
 
-def init_db():
+# реплики: только чтение
+read_engines = [create_db_engine(url) for url in DB_READ_URLS]
+
+_read_sessionmakers = [
+    sessionmaker(
+        bind=e,
+        autoflush=False,
+        autocommit=False,
+        expire_on_commit=False
+    )
+    for e in read_engines
+]
+_read_rr = itertools.count()
+_last_write = 0.0
+
+
+def mark_write():
+    # read-your-writes: после записи какое-то время читаем с основной БД
+    global _last_write
+    _last_write = time.monotonic()
+
+
+_pinned_read: contextvars.ContextVar = contextvars.ContextVar("pinned_read", default=None)
+
+
+def _pick_read_sessionmaker():
+    if not _read_sessionmakers or time.monotonic() - _last_write < READ_STICKY_SECONDS:
+        return SessionLocal
+    return _read_sessionmakers[next(_read_rr) % len(_read_sessionmakers)]
+
+
+def read_session():
+    return (_pinned_read.get() or _pick_read_sessionmaker())()
+
+
+@contextmanager
+def pinned_reads():
+    # все read_session() внутри идут в одну и ту же БД: версии данных,
+    # прочитанные первыми, не новее самих данных (реплики отстают по-разному)
+    token = _pinned_read.set(_pick_read_sessionmaker())
+    try:
+        yield
+    finally:
+        _pinned_read.reset(token)
+
+
+# канал LISTEN/NOTIFY об изменении статуса (только PostgreSQL)
+STATUS_CHANNEL = "site_status"
+
+# Куда уходят записи ActionLog из set_status. По умолчанию (None) они
+# пишутся в той же транзакции; app.audit подменяет это очередью.
+_action_log_sink = None
+
+
+def set_action_log_sink(sink):
+    global _action_log_sink
+    _action_log_sink = sink
+
+
+DATA_VERSION_KEYS = ("status", "users", "logs")
+
+
+def bump_versions(ses, *keys: str):
+    # в той же транзакции, что и само изменение
+    ses.query(DataVersion).filter(DataVersion.key.in_(keys)).update(
+        {DataVersion.version: DataVersion.version + 1},
+        synchronize_session=False
+    )
+
+
+def get_data_versions() -> dict:
+    ses = read_session()
+    try:
+        return dict(ses.query(DataVersion.key, DataVersion.version).all())
+    finally:
+        ses.close()
+
+
+def write_action_logs(entries: list[dict]):
+    ses = WriteSession()
+    try:
+        ses.add_all([ActionLog(**e) for e in entries])
+        bump_versions(ses, "logs")
+        ses.commit()
+    finally:
+        ses.close()
+
+
+def ensure_indexes():
+    # create_all не добавляет новые индексы в уже существующие таблицы
+    for idx in ActionLog.__table__.indexes:
+        idx.create(bind=engine, checkfirst=True)
+
+
+def ensure_schema():
     Base.metadata.create_all(bind=engine)
-    ses = SessionLocal()
+    ensure_indexes()
+
+    ses = WriteSession()
+    try:
+        existing = {k for (k,) in ses.query(DataVersion.key)}
+        missing = [k for k in DATA_VERSION_KEYS if k not in existing]
+        if missing:
+            ses.add_all([DataVersion(key=k, version=0) for k in missing])
+            ses.commit()
+    finally:
+        ses.close()
+
+
+def init_db():
+    ensure_schema()
+    ses = WriteSession()
     try:
         if ses.query(SiteStatus).count() == 0:
             ses.add(SiteStatus(id=1, status="off"))
             ses.commit()
+        if ses.query(EscalationPolicy).count() == 0:
+            # как было раньше: 20:00, 20:30, 21:00, 21:30 всем админам и нотифаерам
+            ses.add(EscalationPolicy(
+                name="default",
+                is_active=True,
+                first_delay_min=30,
+                backoff=1.0,
+                max_steps=4,
+                step_roles="admin,notifier",
+                stop_at="22:00"
+            ))
+            ses.commit()
     finally:
         ses.close()
 
 
 def add_user(tg_id: int, name: str, role: RoleEnum):
-    ses = SessionLocal()
+    ses = WriteSession()
     try:
         user = User(
             telegram_id=str(tg_id),
@@ -33,15 +248,18 @@ def add_user(tg_id: int, name: str, role: RoleEnum):
             role=role
         )
         ses.add(user)
+        bump_versions(ses, "users")
         ses.commit()
-        ses.refresh(user)
+        mark_write()
+        # без refresh: id и python-side defaults заполнены при flush,
+        # а повторное чтение открыло бы ещё один BEGIN IMMEDIATE
         return user
     finally:
         ses.close()
 
 
 def get_user_by_tg_id(tg_id: int):
-    ses = SessionLocal()
+    ses = read_session()
     try:
         return ses.query(User).filter(User.telegram_id == str(tg_id)).first()
     finally:
@@ -49,7 +267,7 @@ def get_user_by_tg_id(tg_id: int):
 
 
 def get_user_by_id(uid: int):
-    ses = SessionLocal()
+    ses = read_session()
     try:
         return ses.query(User).filter(User.id == uid).first()
     finally:
@@ -57,30 +275,46 @@ def get_user_by_id(uid: int):
 
 
 def delete_user(user_id: int):
-    ses = SessionLocal()
+    ses = WriteSession()
     try:
         u = ses.query(User).filter_by(id=user_id).first()
         if u:
             ses.delete(u)
+            bump_versions(ses, "users")
             ses.commit()
+            mark_write()
+    finally:
+        ses.close()
+
+
+def update_user(user_id: int, name: str, tg_id: str, role: RoleEnum):
+    ses = WriteSession()
+    try:
+        u = ses.query(User).filter_by(id=user_id).first()
+        if u:
+            u.name = name
+            u.telegram_id = tg_id
+            u.role = role
+            bump_versions(ses, "users")
+            ses.commit()
+            mark_write()
+        return u
     finally:
         ses.close()
 
 
 def get_all_users():
-    ses = SessionLocal()
+    ses = read_session()
     try:
         return ses.query(User).all()
     finally:
         ses.close()
 
 
-def get_all_receivers():
-    ses = SessionLocal()
+def get_receivers(roles: list[RoleEnum]):
+    ses = read_session()
     try:
-        users = ses.query(User).filter(
-            User.role.in_([RoleEnum.admin, RoleEnum.notifier])
-        ).all()
+        users = ses.query(User).filter(User.role.in_(roles)).all()
 
         res = []
         for u in users:
@@ -91,8 +325,96 @@ def get_all_receivers():
         ses.close()
 
 
-def get_status():
-    ses = SessionLocal()
+def get_all_receivers():
+    return get_receivers([RoleEnum.admin, RoleEnum.notifier])
+
+
+def get_escalation_policy():
+    ses = read_session()
+    try:
+        return (
+            ses.query(EscalationPolicy)
+            .filter(EscalationPolicy.is_active.is_(True))
+            .order_by(EscalationPolicy.id)
+            .first()
+        )
+    finally:
+        ses.close()
+
+
+def get_users_by_tg_ids(tg_ids):
+    ses = read_session()
+    try:
+        ids = list({str(i) for i in tg_ids})
+        if not ids:
+            return {}
+        users = ses.query(User).filter(User.telegram_id.in_(ids)).all()
+        return {u.telegram_id: u for u in users}
+    finally:
+        ses.close()
+
+
+def search_action_logs(
+        actor: str | None = None,
+        action: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        before: tuple[datetime, int] | None = None,
+        after: tuple[datetime, int] | None = None,
+        per_page: int = 50
+):
+    # keyset-пагинация по (timestamp, id): before — страница старше курсора,
+    # after — новее; без OFFSET, глубина страницы не влияет на стоимость.
+    # возвращает (записи от новых к старым, есть ли старее, есть ли новее)
+    ses = read_session()
+    try:
+        q = ses.query(ActionLog)
+
+        if actor:
+            actors = [actor]
+            if not actor.isdigit():
+                # по имени: все telegram_id с подходящим именем
+                actors += [
+                    tg for (tg,) in ses.query(User.telegram_id)
+                    .filter(User.name.ilike(f"%{actor}%"))
+                ]
+            q = q.filter(ActionLog.actor.in_(actors))
+        if action:
+            q = q.filter(ActionLog.action == action)
+        if date_from:
+            q = q.filter(ActionLog.timestamp >= datetime.combine(date_from, dtime.min))
+        if date_to:
+            q = q.filter(ActionLog.timestamp < datetime.combine(date_to + timedelta(days=1), dtime.min))
+
+        key = tuple_(ActionLog.timestamp, ActionLog.id)
+
+        if after is not None:
+            rows = (
+                q.filter(key > tuple_(*after))
+                .order_by(ActionLog.timestamp.asc(), ActionLog.id.asc())
+                .limit(per_page + 1)
+                .all()
+            )
+            if len(rows) > per_page:
+                return rows[:per_page][::-1], True, True
+            # дошли до самых новых — показываем обычную первую страницу
+            before = None
+
+        if before is not None:
+            q = q.filter(key < tuple_(*before))
+
+        rows = (
+            q.order_by(ActionLog.timestamp.desc(), ActionLog.id.desc())
+            .limit(per_page + 1)
+            .all()
+        )
+        return rows[:per_page], len(rows) > per_page, before is not None
+    finally:
+        ses.close()
+
+
+def get_status(primary: bool = False):
+    ses = SessionLocal() if primary else read_session()
     try:
         return ses.get(SiteStatus, 1)
     finally:
@@ -100,9 +422,10 @@ def get_status():
 
 
 def set_status(new_status: str, actor_id: int | str):
-    ses = SessionLocal()
+    ses = WriteSession()
     try:
         st = ses.get(SiteStatus, 1)
+        old = "unknown"
 
         if not st:
             st = SiteStatus(id=1, status=new_status, updated_by=str(actor_id))
@@ -112,14 +435,30 @@ def set_status(new_status: str, actor_id: int | str):
             st.status = new_status
             st.updated_by = str(actor_id)
 
-        ses.add(ActionLog(
+        entry = dict(
             actor=str(actor_id),
             action=f"set_{new_status}",
-            details=f"old_status={old if 'old' in locals() else 'unknown'}"
-        ))
+            details=f"old_status={old}",
+            timestamp=now_moscow()
+        )
+        sink = _action_log_sink
+        if sink is None:
+            ses.add(ActionLog(**entry))
+            bump_versions(ses, "status", "logs")
+        else:
+            bump_versions(ses, "status")
+
+        if engine.dialect.name == "postgresql":
+            # доставится подписчикам (кэш статуса в боте) после commit
+            ses.execute(text("SELECT pg_notify(:ch, :st)"), {"ch": STATUS_CHANNEL, "st": new_status})
 
         ses.commit()
-        ses.refresh(st)
-        return st
+        mark_write()
     finally:
         ses.close()
+
+    # после close: при заполненной очереди аудита ждём здесь, не держа соединение
+    # (и не занимая единственного писателя SQLite)
+    if sink is not None:
+        sink(entry)
+    return st
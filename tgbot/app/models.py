@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Boolean, Float, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime
 import enum
@@ -45,3 +45,38 @@ class ActionLog(Base):
     action = Column(String)
     details = Column(String)
     timestamp = Column(DateTime, default=now_moscow)
+
+    # под фильтры страницы логов: точное совпадение + диапазон дат
+    __table_args__ = (
+        Index("ix_action_log_timestamp", "timestamp", "id"),
+        Index("ix_action_log_actor_timestamp", "actor", "timestamp", "id"),
+        Index("ix_action_log_action_timestamp", "action", "timestamp", "id"),
+    )
+
+
+class EscalationPolicy(Base):
+    __tablename__ = "escalation_policy"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    is_active = Column(Boolean, default=True)
+    # первый повтор через N минут после вечерней проверки
+    first_delay_min = Column(Integer, default=30)
+    # множитель интервала: 1 — равные промежутки, 2 — каждый следующий вдвое длиннее
+    backoff = Column(Float, default=1.0)
+    # всего напоминаний, включая первое
+    max_steps = Column(Integer, default=4)
+    # роли по шагам через ";" (например "admin;admin,notifier"),
+    # последний список действует для всех оставшихся шагов
+    step_roles = Column(String, default="admin,notifier")
+    # "HH:MM" — позже не напоминаем
+    stop_at = Column(String, nullable=True)
+
+
+class DataVersion(Base):
+    # счётчики изменений для ETag страниц админки:
+    # "status", "users", "logs"
+    __tablename__ = "data_version"
+
+    key = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
@@ -0,0 +1,209 @@
+# app/profiler.py
+# Сэмплирующий профилировщик, который можно включить на лету
+# в работающем процессе бота или админки.
+import asyncio
+import io
+import logging
+import marshal
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from app.config import PROFILER_INTERVAL_MS, PROFILER_MAX_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ThreadPoolExecutor-0_3 / asyncio_7 -> ThreadPoolExecutor / asyncio,
+# чтобы потоки одного пула (в т.ч. asyncio.to_thread) сворачивались в один стек
+_THREAD_SUFFIX = re.compile(r"[-_][\d_]+$")
+
+
+def _frame_key(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _walk(frame):
+    # кадры от корня к листу
+    stack = []
+    while frame is not None:
+        stack.append(_frame_key(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _walk_task(task):
+    # цепочка await от внешней корутины задачи к самой внутренней;
+    # выполняющаяся прямо сейчас задача уже видна в стеке потока
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        if getattr(coro, "cr_running", False):
+            return ()
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_key(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(stack)
+
+
+def _label(key):
+    filename, lineno, name = key
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+class SamplingProfiler:
+
+    def __init__(self, interval: float = PROFILER_INTERVAL_MS / 1000):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._samples: Counter = Counter()
+        self.started_at: datetime | None = None
+        self.finished_at: datetime | None = None
+        self.ticks = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, loop: asyncio.AbstractEventLoop | None = None):
+        duration = max(1.0, min(float(duration), PROFILER_MAX_SECONDS))
+
+        with self._lock:
+            if self.running:
+                raise RuntimeError("Profiler is already running")
+
+            self._samples = Counter()
+            self._loop = loop
+            self._stop.clear()
+            self.ticks = 0
+            self.started_at = datetime.now()
+            self.finished_at = None
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(time.monotonic() + duration,),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self._thread.start()
+
+        logger.info("Profiler started for %.0fs (interval=%.3fs)", duration, self.interval)
+        return duration
+
+    def stop(self):
+        self._stop.set()
+        self.join()
+
+    def join(self, timeout: float | None = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, deadline: float):
+        own = threading.get_ident()
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                self._sample(own)
+                self._stop.wait(self.interval)
+        except Exception as e:
+            logger.exception("Profiler sampling failed: %s", e)
+        finally:
+            self.finished_at = datetime.now()
+            logger.info("Profiler stopped after %d ticks", self.ticks)
+
+    def _sample(self, own: int):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        samples = Counter()
+
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            name = _THREAD_SUFFIX.sub("", names.get(ident, str(ident)))
+            samples[(("thread", name),) + _walk(frame)] += 1
+
+        # стеки ожидающих корутин: где именно "висят" задачи event loop'а
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            for task in asyncio.all_tasks(loop):
+                if task.done():
+                    continue
+                try:
+                    frames = _walk_task(task)
+                except Exception:
+                    continue
+                if frames:
+                    samples[(("task", "asyncio"),) + frames] += 1
+
+        with self._lock:
+            self._samples.update(samples)
+            self.ticks += 1
+
+    # -----------------------------------------------------
+    # Выгрузка результатов
+    # -----------------------------------------------------
+
+    def _snapshot(self) -> Counter:
+        with self._lock:
+            return Counter(self._samples)
+
+    def collapsed(self) -> str:
+        # формат "a;b;c N" для flamegraph.pl / speedscope
+        out = io.StringIO()
+        for stack, count in sorted(self._snapshot().items()):
+            kind, name = stack[0]
+            frames = [f"{kind}:{name}"] + [_label(k) for k in stack[1:]]
+            out.write(";".join(frames))
+            out.write(f" {count}\n")
+        return out.getvalue()
+
+    def pstats_bytes(self) -> bytes:
+        # тот же формат, что пишет cProfile.Profile.dump_stats;
+        # время оценивается как число сэмплов * интервал
+        own = Counter()
+        total = Counter()
+        callers: dict = {}
+
+        for stack, count in self._snapshot().items():
+            frames = stack[1:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for func in set(frames):
+                total[func] += count
+            for caller, callee in zip(frames, frames[1:]):
+                edges = callers.setdefault(callee, Counter())
+                edges[caller] += count
+
+        stats = {}
+        for func, count in total.items():
+            tt = own[func] * self.interval
+            ct = count * self.interval
+            func_callers = {
+                caller: (n, n, 0.0, n * self.interval)
+                for caller, n in callers.get(func, {}).items()
+            }
+            stats[func] = (count, count, tt, ct, func_callers)
+
+        return marshal.dumps(stats)
+
+    def info(self) -> dict:
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "stacks": len(self._samples),
+        }
+
+
+# один профилировщик на процесс
+profiler = SamplingProfiler()
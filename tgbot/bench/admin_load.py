@@ -0,0 +1,315 @@
+# bench/admin_load.py
+# Нагрузочный прогон админки (app/admin/admin_app.py) в одном процессе:
+# временная SQLite-база с заданным числом пользователей и логов,
+# параллельные клиенты через ASGI-транспорт httpx, отчёт по
+# пропускной способности, хвостам задержек и числу SQL-запросов на запрос.
+# Нужен httpx (pip install "httpx<0.28"), в requirements.txt его нет.
+#
+#   python -m bench.admin_load --users 500 --logs 100000 --concurrency 16 --requests 4000
+#   python -m bench.admin_load --save-baseline            # записать bench/baselines/admin_load.json
+#   python -m bench.admin_load --compare                  # сравнить с сохранённым
+import argparse
+import asyncio
+import contextvars
+import html
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = ROOT / "bench" / "baselines" / "admin_load.json"
+ADMIN_KEY = "bench-key"
+NEXT_LINK = re.compile(r'<a href="([^"]+)">Вперёд')
+
+# счётчик SQL-запросов текущего HTTP-запроса; контекст доходит
+# и до потоков threadpool, в которых работают синхронные обработчики
+_queries: contextvars.ContextVar = contextvars.ContextVar("queries", default=None)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Admin app load test")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--logs", type=int, default=50000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db", help="путь к SQLite-файлу (по умолчанию временный)")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE))
+    parser.add_argument("--compare", nargs="?", const=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое ухудшение, доля")
+    return parser.parse_args()
+
+
+def setup_environment(args) -> str:
+    # до импорта app.*: config читает переменные окружения при импорте
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="admin-load-"), "admin.db")
+    os.environ["DB_URL"] = f"sqlite:///{path}"
+    os.environ["ADMIN_API_KEY"] = ADMIN_KEY
+    os.environ.setdefault("DB_READ_URLS", "")
+    # шаблоны и статика подключаются относительными путями
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    return path
+
+
+def seed(users: int, logs: int, rnd: random.Random):
+    from sqlalchemy import insert
+    from app.db import engine, init_db
+    from app.models import User, ActionLog, RoleEnum
+
+    init_db()
+    roles = list(RoleEnum)
+    actions = ["set_on", "set_off", "login", "user_edit", "access_request"]
+    start = datetime.now() - timedelta(days=365)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"telegram_id": str(10 ** 8 + i), "name": f"Пользователь {i}", "role": rnd.choice(roles)}
+            for i in range(users)
+        ])
+
+        batch = []
+        for i in range(logs):
+            action = rnd.choice(actions)
+            batch.append({
+                "actor": str(10 ** 8 + rnd.randrange(users)) if users else "auto",
+                "action": action,
+                "details": "old_status=on" if action == "set_off" else "old_status=off",
+                "timestamp": start + timedelta(seconds=i * 365 * 86400 / max(logs, 1)),
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(ActionLog), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(ActionLog), batch)
+
+
+def count_queries(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _count(*_args):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+# ---------------------------------------------------------
+# Сценарии: (метка, вес, функция)
+# ---------------------------------------------------------
+
+def build_scenarios(users: int, rnd: random.Random):
+    etags: dict = {}
+    next_links: list = []
+
+    async def index(client):
+        return [await client.get("/admin")]
+
+    async def index_refresh(client):
+        # повторное открытие дашборда браузером: If-None-Match
+        headers = {"If-None-Match": etags["index"]} if "index" in etags else {}
+        resp = await client.get("/admin", headers=headers)
+        if "etag" in resp.headers:
+            etags["index"] = resp.headers["etag"]
+        return [resp]
+
+    async def users_page(client):
+        return [await client.get("/admin/users")]
+
+    async def logs_page(client):
+        if next_links and rnd.random() < 0.5:
+            # листание вглубь по ссылкам «Вперёд» с уже открытых страниц
+            resp = await client.get(rnd.choice(next_links))
+        else:
+            resp = await client.get("/admin/logs", params=log_filters())
+        m = NEXT_LINK.search(resp.text)
+        if m and len(next_links) < 1000:
+            next_links.append(html.unescape(m.group(1)))
+        return [resp]
+
+    def log_filters() -> dict:
+        params = {}
+        kind = rnd.random()
+        if kind < 0.25 and users:
+            params["actor"] = str(10 ** 8 + rnd.randrange(users))
+        elif kind < 0.5:
+            params["action"] = rnd.choice(["set_on", "set_off"])
+        elif kind < 0.65:
+            day = datetime.now().date() - timedelta(days=rnd.randint(1, 300))
+            params["date_from"] = day.isoformat()
+            params["date_to"] = (day + timedelta(days=7)).isoformat()
+        return params
+
+    async def edit_user(client):
+        uid = rnd.randint(1, max(users, 1))
+        page = await client.get(f"/admin/users/edit/{uid}")
+        saved = await client.post(
+            f"/admin/users/edit/{uid}",
+            data={"name": f"Пользователь {uid} ({rnd.randint(0, 999)})", "tg_id": str(10 ** 8 + uid - 1),
+                  "role": rnd.choice(["admin", "notifier", "user", "guest"])}
+        )
+        return [page, saved]
+
+    return [
+        ("GET /admin", 3, index),
+        ("GET /admin (304)", 3, index_refresh),
+        ("GET /admin/users", 2, users_page),
+        ("GET /admin/logs", 4, logs_page),
+        ("edit user", 1, edit_user),
+    ]
+
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+async def run_load(args, rnd: random.Random) -> dict:
+    import httpx
+    from app.admin.admin_app import app
+    from app.audit import audit
+    from app.db import engine
+
+    count_queries(engine)
+    scenarios = build_scenarios(args.users, rnd)
+    labels = [s[0] for s in scenarios]
+    weights = [s[1] for s in scenarios]
+    by_label = {s[0]: s[2] for s in scenarios}
+
+    samples = {label: {"lat": [], "queries": [], "errors": 0} for label in labels}
+    remaining = args.requests
+
+    # lifespan через ASGITransport не запускается — поднимаем очередь аудита сами
+    audit.start()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://admin",
+                                 cookies={"admin_key": ADMIN_KEY}) as client:
+
+        async def one(label: str):
+            counter = [0]
+            token = _queries.set(counter)
+            started = time.perf_counter()
+            try:
+                responses = await by_label[label](client)
+                if any(r.status_code >= 400 for r in responses):
+                    samples[label]["errors"] += 1
+            except Exception:
+                samples[label]["errors"] += 1
+            finally:
+                _queries.reset(token)
+            samples[label]["lat"].append(time.perf_counter() - started)
+            samples[label]["queries"].append(counter[0])
+
+        async def client_loop():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                await one(rnd.choices(labels, weights)[0])
+
+        # прогрев: шаблоны, кэш страниц
+        for label in labels:
+            await one(label)
+        for s in samples.values():
+            s["lat"].clear()
+            s["queries"].clear()
+            s["errors"] = 0
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    await audit.stop()
+
+    results = {}
+    total = 0
+    for label, s in samples.items():
+        n = len(s["lat"])
+        total += n
+        results[label] = {
+            "requests": n,
+            "rps": round(n / elapsed, 1),
+            "p50_ms": round(percentile(s["lat"], 0.50) * 1000, 2),
+            "p95_ms": round(percentile(s["lat"], 0.95) * 1000, 2),
+            "p99_ms": round(percentile(s["lat"], 0.99) * 1000, 2),
+            "max_ms": round(max(s["lat"], default=0) * 1000, 2),
+            "queries_per_request": round(sum(s["queries"]) / n, 2) if n else 0,
+            "errors": s["errors"],
+        }
+    results["total"] = {"requests": total, "rps": round(total / elapsed, 1), "seconds": round(elapsed, 2)}
+    return results
+
+
+def print_report(results: dict):
+    print(f"{'endpoint':<20} {'req':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'q/req':>6} {'err':>4}")
+    for label, r in results.items():
+        if label == "total":
+            continue
+        print(f"{label:<20} {r['requests']:>6} {r['rps']:>8} {r['p50_ms']:>8} {r['p95_ms']:>8} "
+              f"{r['p99_ms']:>8} {r['max_ms']:>8} {r['queries_per_request']:>6} {r['errors']:>4}")
+    t = results["total"]
+    print(f"total: {t['requests']} requests in {t['seconds']}s, {t['rps']} req/s")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    print(f"\ncompared with baseline from {baseline['created']}:")
+    ok = True
+    for label, r in results.items():
+        base = baseline["results"].get(label)
+        if not base or label == "total":
+            continue
+        rps = (r["rps"] - base["rps"]) / base["rps"] if base["rps"] else 0.0
+        p95 = (r["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0.0
+        # число запросов слегка плавает из-за попаданий в кэш страниц
+        more_queries = r["queries_per_request"] > base["queries_per_request"] * (1 + tolerance)
+        worse = rps < -tolerance or p95 > tolerance or more_queries
+        ok = ok and not worse
+        print(f"  {label:<20} rps {rps:+.0%}  p95 {p95:+.0%}  "
+              f"q/req {base['queries_per_request']} -> {r['queries_per_request']}"
+              f"{'  REGRESSION' if worse else ''}")
+    return ok
+
+
+def main():
+    args = parse_args()
+    db_path = setup_environment(args)
+    rnd = random.Random(args.seed)
+
+    print(f"seeding {args.users} users, {args.logs} log rows into {db_path} ...")
+    seed(args.users, args.logs, rnd)
+
+    results = asyncio.run(run_load(args, rnd))
+    print_report(results)
+
+    config = {k: getattr(args, k) for k in ("users", "logs", "concurrency", "requests", "seed")}
+
+    if args.save_baseline:
+        Path(args.save_baseline).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save_baseline).write_text(json.dumps({
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "machine": f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+            "config": config,
+            "results": results,
+        }, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if baseline["config"] != config:
+            print(f"warning: baseline config differs: {baseline['config']}")
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# bench/fake_bot_api.py
+# Фейковый Bot API для проверки app/bot/transport.py без Telegram.
+#
+# Сервер (бот подключается через TELEGRAM_API_URL=http://localhost:8081):
+#   python -m bench.fake_bot_api --port 8081 --error-rate 0.2 --flood-rate 0.05
+#
+# Прогон ResilientSession против сервера в том же процессе:
+#   python -m bench.fake_bot_api --drive 500 --concurrency 20 --error-rate 0.2
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+from aiogram import Bot
+from aiogram.client.telegram import TelegramAPIServer
+
+from app.bot.transport import ResilientSession, CircuitBreaker
+
+FAKE_TOKEN = "42:FAKE"
+
+
+def make_app(latency_ms: float, error_rate: float, flood_rate: float, drop_rate: float) -> web.Application:
+    counters = {"requests": 0, "errors": 0, "floods": 0, "drops": 0}
+    message_ids = iter(range(1, 10 ** 9))
+
+    async def handle(request: web.Request) -> web.StreamResponse:
+        counters["requests"] += 1
+        method = request.match_info["method"]
+        data = await request.post()
+
+        if latency_ms:
+            await asyncio.sleep(random.expovariate(1 / (latency_ms / 1000)))
+
+        roll = random.random()
+        if roll < drop_rate:
+            # обрыв соединения без ответа
+            counters["drops"] += 1
+            request.transport.close()
+            return web.Response()
+        roll -= drop_rate
+        if roll < flood_rate:
+            counters["floods"] += 1
+            return web.json_response(
+                {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                 "parameters": {"retry_after": 1}},
+                status=429
+            )
+        roll -= flood_rate
+        if roll < error_rate:
+            counters["errors"] += 1
+            return web.json_response(
+                {"ok": False, "error_code": 502, "description": "Bad Gateway"},
+                status=502
+            )
+
+        if method == "getMe":
+            result = {"id": 42, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method in ("sendMessage", "editMessageText", "sendDocument"):
+            chat_id = int(data.get("chat_id", 0))
+            result = {
+                "message_id": next(message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        elif method == "getUpdates":
+            await asyncio.sleep(min(float(data.get("timeout", 0) or 0), 1))
+            result = []
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def stats(_: web.Request) -> web.Response:
+        return web.Response(text=json.dumps(counters, indent=2))
+
+    app = web.Application()
+    app["counters"] = counters
+    app.router.add_post("/bot{token}/{method}", handle)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+async def drive(app: web.Application, port: int, total: int, concurrency: int):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+
+    session = ResilientSession(
+        api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}"),
+        backoff_base=0.05,
+        breaker=CircuitBreaker(threshold=10, cooldown=1.0)
+    )
+    bot = Bot(FAKE_TOKEN, session=session)
+    sem = asyncio.Semaphore(concurrency)
+    outcome = {"ok": 0, "failed": 0}
+
+    async def send(i: int):
+        async with sem:
+            try:
+                await bot.send_message(1000 + i % 50, f"message {i}")
+                outcome["ok"] += 1
+            except Exception:
+                outcome["failed"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(f"sent {total} in {elapsed:.2f}s ({total / elapsed:.0f} msg/s): {outcome}")
+    print("server:", app["counters"])
+    print("session:", json.dumps(session.stats(), indent=2))
+
+    await session.close()
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 502")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="доля оборванных соединений")
+    parser.add_argument("--drive", type=int, default=0, help="отправить N сообщений через ResilientSession")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    app = make_app(args.latency_ms, args.error_rate, args.flood_rate, args.drop_rate)
+
+    if args.drive:
+        asyncio.run(drive(app, args.port, args.drive, args.concurrency))
+    else:
+        web.run_app(app, host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
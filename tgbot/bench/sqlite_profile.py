@@ -0,0 +1,148 @@
+# bench/sqlite_profile.py
+# Сравнение SQLite-профиля из app/db.py с create_engine по умолчанию
+# под параллельной нагрузкой: несколько процессов (бот + админка),
+# в каждом потоки-читатели и потоки-писатели.
+#
+#   python -m bench.sqlite_profile --seconds 10 --procs 2 --readers 8 --writers 4
+import argparse
+import multiprocessing as mp
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.db import create_sqlite_engine, SerializedWriteSession
+from app.models import Base, SiteStatus, User, ActionLog, RoleEnum, now_moscow
+
+
+def make_sessions(profile: str, url: str):
+    if profile == "default":
+        eng = create_engine(url)
+        maker = sessionmaker(bind=eng, expire_on_commit=False)
+        return eng, maker, maker
+
+    eng = create_sqlite_engine(url)
+    read = sessionmaker(bind=eng, expire_on_commit=False)
+    write = sessionmaker(
+        bind=eng.execution_options(sqlite_begin="IMMEDIATE"),
+        class_=SerializedWriteSession,
+        expire_on_commit=False
+    )
+    return eng, read, write
+
+
+def seed(url: str, users: int):
+    eng = create_engine(url)
+    Base.metadata.create_all(bind=eng)
+    ses = sessionmaker(bind=eng)()
+    ses.add(SiteStatus(id=1, status="off"))
+    ses.add_all([
+        User(telegram_id=str(10 ** 6 + i), name=f"user{i}", role=RoleEnum.user)
+        for i in range(users)
+    ])
+    ses.commit()
+    ses.close()
+    eng.dispose()
+
+
+def worker(profile: str, url: str, seconds: float, readers: int, writers: int, results):
+    eng, ReadSession, WriteSession = make_sessions(profile, url)
+    deadline = time.monotonic() + seconds
+    counts = {"reads": 0, "writes": 0, "locked": 0, "errors": 0, "write_lat": []}
+    lock = threading.Lock()
+
+    def bump(key, n=1):
+        with lock:
+            counts[key] += n
+
+    def read_loop():
+        while time.monotonic() < deadline:
+            ses = ReadSession()
+            try:
+                ses.get(SiteStatus, 1)
+                ses.query(User).filter(User.role == RoleEnum.user).limit(20).all()
+                bump("reads")
+            except OperationalError as e:
+                bump("locked" if "locked" in str(e) else "errors")
+            finally:
+                ses.close()
+
+    def write_loop(n: int):
+        i = 0
+        while time.monotonic() < deadline:
+            i += 1
+            started = time.perf_counter()
+            ses = WriteSession()
+            try:
+                st = ses.get(SiteStatus, 1)
+                st.status = "on" if i % 2 else "off"
+                ses.add(ActionLog(actor=str(n), action=f"set_{st.status}", details="bench", timestamp=now_moscow()))
+                ses.commit()
+                bump("writes")
+                with lock:
+                    counts["write_lat"].append(time.perf_counter() - started)
+            except OperationalError as e:
+                ses.rollback()
+                bump("locked" if "locked" in str(e) else "errors")
+            finally:
+                ses.close()
+
+    threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(n,)) for n in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    eng.dispose()
+    results.put(counts)
+
+
+def run(profile: str, args) -> dict:
+    tmp = tempfile.mkdtemp(prefix=f"sqlite-{profile}-")
+    url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    seed(url, args.users)
+
+    results = mp.Queue()
+    procs = [
+        mp.Process(target=worker, args=(profile, url, args.seconds, args.readers, args.writers, results))
+        for _ in range(args.procs)
+    ]
+    for p in procs:
+        p.start()
+    parts = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    lat = sorted(x for part in parts for x in part["write_lat"])
+    total = {k: sum(part[k] for part in parts) for k in ("reads", "writes", "locked", "errors")}
+    total["reads_per_s"] = round(total["reads"] / args.seconds)
+    total["writes_per_s"] = round(total["writes"] / args.seconds)
+    total["write_p99_ms"] = round(lat[int(0.99 * (len(lat) - 1))] * 1000, 1) if lat else None
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite engine profile benchmark")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--procs", type=int, default=2, help="процессов (бот + админка)")
+    parser.add_argument("--readers", type=int, default=8, help="потоков-читателей на процесс")
+    parser.add_argument("--writers", type=int, default=4, help="потоков-писателей на процесс")
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'profile':<8} {'reads/s':>9} {'writes/s':>9} {'write p99':>10} {'locked':>7} {'errors':>7}")
+    for profile in ("default", "tuned"):
+        r = run(profile, args)
+        print(
+            f"{profile:<8} {r['reads_per_s']:>9} {r['writes_per_s']:>9} "
+            f"{str(r['write_p99_ms']) + ' ms':>10} {r['locked']:>7} {r['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
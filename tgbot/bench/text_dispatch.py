@@ -0,0 +1,98 @@
+# bench/text_dispatch.py
+# Стоимость диспетчеризации одного сообщения: прежняя цепочка фильтров
+# aiogram (Command / F.text == / lambda) против TextRouter.
+# Обработчики пустые — меряется только выбор обработчика.
+#
+#   python -m bench.text_dispatch --n 20000
+import argparse
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher, F
+from aiogram.filters import Command, CommandStart
+from aiogram.types import Update
+
+from app.bot.text_router import TextRouter
+
+BUTTONS = ["Проверить статус", "Оборудование включено", "Оборудование выключено", "Админка"]
+COMMANDS = ["start", "status", "on", "off", "profile", "stats"]
+
+SAMPLES = {
+    "first button": "Админка",
+    "last button": "Оборудование включено",
+    "command": "/off",
+    "unknown text": "привет, как дела?",
+    "unknown command": "/help",
+}
+
+
+async def noop(*_args, **_kwargs):
+    return None
+
+
+def chain_dispatcher() -> Dispatcher:
+    # в том же порядке, что был в app/bot/bot.py
+    dp = Dispatcher()
+    dp.message.register(noop, lambda m: m.text and m.text.strip() == "Админка")
+    dp.message.register(noop, Command("profile"))
+    dp.message.register(noop, Command("stats"))
+    dp.message.register(noop, CommandStart())
+    dp.message.register(noop, Command("status"))
+    dp.message.register(noop, Command("on"))
+    dp.message.register(noop, Command("off"))
+    dp.message.register(noop, F.text == "Проверить статус")
+    dp.message.register(noop, F.text == "Оборудование выключено")
+    dp.message.register(noop, F.text == "Оборудование включено")
+    return dp
+
+
+def router_dispatcher() -> Dispatcher:
+    dp = Dispatcher()
+    router = TextRouter()
+    router.text(*BUTTONS)(noop)
+    router.command(*COMMANDS)(noop)
+    dp.message.register(router.dispatch)
+    return dp
+
+
+def make_update(i: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": i,
+        "message": {
+            "message_id": i,
+            "date": 0,
+            "chat": {"id": 1, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "bench"},
+            "text": text,
+        },
+    })
+
+
+async def measure(dp: Dispatcher, bot: Bot, text: str, n: int) -> float:
+    updates = [make_update(i, text) for i in range(n)]
+    for u in updates[:200]:
+        await dp.feed_update(bot, u)
+
+    started = time.perf_counter()
+    for u in updates:
+        await dp.feed_update(bot, u)
+    return (time.perf_counter() - started) / n * 1e6
+
+
+async def main(n: int):
+    bot = Bot("42:BENCH")
+    chain, router = chain_dispatcher(), router_dispatcher()
+
+    print(f"{'message':<16} {'chain, µs':>10} {'router, µs':>11} {'speedup':>8}")
+    for label, text in SAMPLES.items():
+        before = await measure(chain, bot, text, n)
+        after = await measure(router, bot, text, n)
+        print(f"{label:<16} {before:>10.1f} {after:>11.1f} {before / after:>7.2f}x")
+
+    await bot.session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-message dispatch cost")
+    parser.add_argument("--n", type=int, default=20000)
+    asyncio.run(main(parser.parse_args().n))